@@ -0,0 +1,8 @@
+def post_worker_init(worker):
+    '''Loads the report fonts while each worker boots rather than on its first PDF request'''
+    from hanbai import reports
+    try:
+        reports.warm()
+    except Exception:
+        # A missing font only breaks PDFs; keep the worker serving everything else.
+        worker.log.exception('Could not warm report fonts')
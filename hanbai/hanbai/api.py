@@ -1,5 +1,11 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
 from . import repositories
 from . import models
+from . import totals_cache
 
 
 def get_order_repository():
@@ -15,6 +21,8 @@ def get_order_repository():
         models.ConsumptionTax,
         models.TaxExemption,
         models.PaymentDetails,
+        models.ExtraField,
+        totals_cache=get_totals_cache(),
     )
 
 
@@ -24,3 +32,21 @@ def get_extras_repo():
         models.CustomSection,
         models.Order,
     )
+
+
+def get_report_job_repository():
+    return repositories.ReportJobRepository(
+        models.ReportJob,
+        models.Order,
+    )
+
+
+def get_report_cache():
+    backend = import_string(settings.REPORT_CACHE['BACKEND'])
+    return backend(**settings.REPORT_CACHE.get('OPTIONS', {}))
+
+
+@lru_cache()
+def get_totals_cache():
+    '''One per process, so the in-process tier outlives requests'''
+    return totals_cache.TotalsCache(settings.TOTALS_CACHE['MAX_ENTRIES'], alias=settings.TOTALS_CACHE['ALIAS'])
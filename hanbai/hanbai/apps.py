@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class HanbaiConfig(AppConfig):
+    name = 'hanbai'
+
+    def ready(self):
+        # Registers the system checks
+        from . import checks  # noqa: F401
@@ -7,10 +7,54 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+
+
+class StreamingASGIHandler(ASGIHandler):
+    '''
+    Django 3.1 iterates streaming responses on the event loop, where the ORM refuses to run.
+    Each streaming response gets a thread of its own to iterate on instead of Django's one sync
+    thread, which every sync view and autosave shares and a long export would hold throughout.
+    '''
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [(b'Set-Cookie', c.output(header='').encode('ascii').strip())
+                   for c in response.cookies.values()]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(header.encode('ascii'), value.encode('latin1'))
+                        for header, value in response.items()] + headers,
+        })
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(1, thread_name_prefix='stream') as thread:
+            parts = await loop.run_in_executor(thread, iter, response)
+            try:
+                while True:
+                    part = await loop.run_in_executor(thread, next, parts, None)
+                    if part is None:
+                        break
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body'})
+            finally:
+                await loop.run_in_executor(thread, self._close_streaming, response)
+
+    @staticmethod
+    def _close_streaming(response):
+        response.close()
+        # The thread ends with the response, so its connections must not be kept for reuse
+        connections.close_all()
+
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hanbai.settings')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+application = StreamingASGIHandler()
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from . import api
+
+
+@register()
+def check_report_cache(app_configs, **kwargs):
+    '''With REPORT_RENDER_ASYNC, reports rendered by report_worker must be readable by the web processes'''
+    if not settings.REPORT_RENDER_ASYNC or api.get_report_cache().is_shared():
+        return []
+    return [Error(
+        'REPORT_RENDER_ASYNC is on, but REPORT_CACHE keeps reports where only the process or host storing them can read them.',
+        hint=('Use hanbai.report_cache.DjangoReportCache on a cache shared between processes, such as a database '
+              'or Redis cache. Silence this check if the web and report_worker processes share one disk.'),
+        id='hanbai.E001',
+    )]
@@ -13,3 +13,12 @@ FORM_MAPPING = {
     forms.ConsumptionTaxForm.form_class: forms.ConsumptionTaxForm,
     forms.TaxExemptionForm.form_class: forms.TaxExemptionForm,
 }
+
+# Must stay even so the alternating row colours line up across pages
+ORDER_LIST_PAGE_SIZE = 50
+
+# Orders read from the database at a time by order exports
+ORDER_EXPORT_CHUNK_SIZE = 500
+
+# Most orders bulk_export lays out as one PDF; the document is built in memory by one process
+BULK_EXPORT_PDF_MAX_ORDERS = 100
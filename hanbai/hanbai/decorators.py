@@ -0,0 +1,51 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+
+
+def database_sync_to_async(func):
+    '''
+    sync_to_async for a self-contained piece of database work, such as one save's whole transaction.
+    It runs on a thread of the event loop's executor rather than Django's one sync thread,
+    so the saves of concurrent requests run side by side, each on its thread's own connection.
+    request_started and request_finished only tidy the sync thread's connections,
+    so stale or broken ones are closed around each call here.
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+# Django 3.1's login_required and require_http_methods only wrap synchronous views
+
+
+def async_login_required(view):
+    '''login_required for async views'''
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user is loaded from the session on first use, which queries the database
+        is_authenticated = await database_sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_http_methods(methods):
+    '''require_http_methods for async views'''
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import csv
+import json
+import multiprocessing
+import zipfile
+
+import django
+
+from . import api
+
+
+def _render_order(order_id):
+    '''Process pool task: one order's PDF, through the shared report cache'''
+    order = api.get_order_repository().get_full_order_or_404(order_id)
+    _, content = api.get_report_cache().get_or_render(order)
+    return order_id, content
+
+
+def render_reports(order_ids, processes):
+    '''
+    Yields (order_id, PDF bytes) in order_ids order, rendered across a process pool.
+    At most two PDFs per process are in flight, so memory does not grow with the number of orders.
+    '''
+    order_ids = iter(order_ids)
+    # Spawned rather than forked: the web process runs threads, which a fork would copy mid-flight
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=django.setup) as executor:
+        in_flight = deque(
+            executor.submit(_render_order, order_id)
+            for order_id in islice(order_ids, processes * 2)
+        )
+        while in_flight:
+            yield in_flight.popleft().result()
+            order_id = next(order_ids, None)
+            if order_id is not None:
+                in_flight.append(executor.submit(_render_order, order_id))
+
+
+class _ZipStream:
+    '''Write-only file for ZipFile that hands back whatever was written since the last pop()'''
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_reports_zip(order_ids, processes, filename_date):
+    '''Yields a ZIP archive of every order's PDF chunk by chunk, one entry at a time'''
+    stream = _ZipStream()
+    # PDFs are compressed already, so entries are only stored
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for order_id, content in render_reports(order_ids, processes):
+            archive.writestr(f'{order_id}-{filename_date}.pdf', content)
+            yield stream.pop()
+    yield stream.pop()
+
+
+class _Echo:
+    '''Write-only file for csv.writer that returns each row instead of storing it'''
+    def write(self, value):
+        return value
+
+
+def _flatten(record):
+    '''One CSV row from an export record: section.field columns, extra field lists as JSON'''
+    row = {}
+    for section, values in record.items():
+        if isinstance(values, list):
+            row[section] = json.dumps(values, ensure_ascii=False)
+        else:
+            row.update((f'{section}.{name}', value) for name, value in values.items())
+    return row
+
+
+def stream_orders_csv(records):
+    '''Yields records as CSV lines, headed by the columns of the first one'''
+    writer = None
+    for record in records:
+        row = _flatten(record)
+        if writer is None:
+            writer = csv.DictWriter(_Echo(), fieldnames=list(row))
+            yield writer.writeheader()
+        yield writer.writerow(row)
+
+
+def stream_orders_jsonl(records):
+    '''Yields records as JSON Lines, one order per line'''
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+ORDER_EXPORT_FORMATS = {
+    'csv': (stream_orders_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (stream_orders_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from django import forms
 from django.utils import timezone
 
@@ -13,21 +15,32 @@ class SelfCleaningForm(forms.ModelForm):
 class CustomFieldsFormSet(forms.BaseModelFormSet):
     @classmethod
     def build_formset(cls, section, initial_instances, extra=1):
-        Factory = forms.modelformset_factory(
-            models.ExtraField,
-            formset=cls,
-            can_delete=True,
-            form=CustomFieldForm,
-            extra=extra,
-            fields='__all__',
-        )
-
+        '''initial_instances is evaluated once here; pass already loaded fields to avoid any query'''
+        Factory = _custom_fields_formset_factory(cls, extra)
         return Factory(
             prefix=type(section).__name__,
             form_kwargs={'section': section},
-            queryset=initial_instances,
+            queryset=list(initial_instances),
         )
 
+    def get_queryset(self):
+        # The list from build_formset is used as given, rather than re-queried in primary key order
+        if isinstance(self.queryset, list):
+            return self.queryset
+        return super().get_queryset()
+
+
+@lru_cache(maxsize=None)
+def _custom_fields_formset_factory(formset, extra):
+    return forms.modelformset_factory(
+        models.ExtraField,
+        formset=formset,
+        can_delete=True,
+        form=CustomFieldForm,
+        extra=extra,
+        fields='__all__',
+    )
+
 
 class CustomFieldForm(SelfCleaningForm):
     form_class = 'custom_field'
@@ -169,3 +182,59 @@ class OrderForm(SelfCleaningForm):
     class Meta:
         fields = ('notes', 'person_in_charge')
         model = models.Order
+
+
+class BulkExportForm(forms.Form):
+    ZIP = 'zip'
+    PDF = 'pdf'
+
+    ids = forms.CharField(required=False, widget=forms.HiddenInput)
+    started_from = forms.DateField(label='着手日（から）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    started_to = forms.DateField(label='着手日（まで）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    format = forms.ChoiceField(label='形式', choices=[(ZIP, 'ZIP'), (PDF, 'PDF (1ファイル)')], initial=ZIP)
+
+    def clean_ids(self):
+        ids = self.cleaned_data['ids']
+        if not ids:
+            return None
+        try:
+            return [int(order_id) for order_id in ids.split(',')]
+        except ValueError:
+            raise forms.ValidationError('注文書IDが正しくありません。')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(field) for field in ['ids', 'started_from', 'started_to']):
+            raise forms.ValidationError('注文書または期間を指定してください。')
+        return cleaned_data
+
+
+class OrderExportForm(forms.Form):
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+    started_from = forms.DateField(label='着手日（から）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    started_to = forms.DateField(label='着手日（まで）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    format = forms.ChoiceField(label='形式', choices=[(CSV, 'CSV'), (JSONL, 'JSON Lines')], initial=CSV)
+
+
+class AnalyticsForm(forms.Form):
+    MONTH = 'month'
+    PERSON = 'person'
+    MONTH_PERSON = 'month_person'
+    GROUPINGS = {
+        MONTH: ['month'],
+        PERSON: ['person_in_charge'],
+        MONTH_PERSON: ['month', 'person_in_charge'],
+    }
+
+    started_from = forms.DateField(label='着手日（から）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    started_to = forms.DateField(label='着手日（まで）', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    group_by = forms.ChoiceField(
+        label='集計単位',
+        choices=[(MONTH, '月別'), (PERSON, '担当者別'), (MONTH_PERSON, '月別・担当者別')],
+        required=False,
+    )
+
+    def clean_group_by(self):
+        return self.GROUPINGS[self.cleaned_data['group_by'] or self.MONTH]
@@ -0,0 +1,32 @@
+from datetime import date
+import sys
+
+from django.core.management.base import BaseCommand
+
+from hanbai import api, exports
+from hanbai.constants import ORDER_EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Writes every unarchived order, with its extra fields, as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.ORDER_EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to instead of stdout')
+        parser.add_argument('--started-from', type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--started-to', type=date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=ORDER_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        records = api.get_order_repository().iter_export_records(
+            started_from=options['started_from'],
+            started_to=options['started_to'],
+            chunk_size=options['chunk_size'],
+        )
+        stream, _ = exports.ORDER_EXPORT_FORMATS[options['format']]
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            output.writelines(stream(records))
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from hanbai import api
+
+
+class Command(BaseCommand):
+    help = 'Checks the stored totals of every unarchived order against freshly computed ones, and rebuilds stale ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report stale orders, and fail if there are any')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        repo = api.get_order_repository()
+        order_ids = repo.get_order_ids()
+        batch_size = options['batch_size']
+        stale_count = 0
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start:start + batch_size]
+            with transaction.atomic():
+                stored = repo.get_stored_totals(batch)
+                stale = {
+                    order_id: totals
+                    for order_id, totals in repo.get_order_totals(batch).items()
+                    if stored.get(order_id) != totals
+                }
+                if stale and not options['check']:
+                    repo.store_totals(stale)
+            for order_id in stale:
+                self.stdout.write(f'Order {order_id} totals are stale')
+            stale_count += len(stale)
+
+        if options['check'] and stale_count:
+            raise CommandError(f'{stale_count} of {len(order_ids)} orders have stale totals')
+        if options['check']:
+            self.stdout.write(f'All {len(order_ids)} orders have up to date totals')
+        else:
+            self.stdout.write(f'Rebuilt the totals of {stale_count} of {len(order_ids)} orders')
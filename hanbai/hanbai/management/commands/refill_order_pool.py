@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hanbai import api
+
+
+class Command(BaseCommand):
+    help = 'Tops up the pool of blank orders that create_new_order hands out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=settings.ORDER_POOL_SIZE)
+
+    def handle(self, *args, **options):
+        added = api.get_order_repository().refill_order_pool(options['size'])
+        self.stdout.write(f'Added {added} blank orders')
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from multiprocessing import Process
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from hanbai import api, reports
+
+
+def render_jobs(poll_interval):
+    '''Worker process: renders claimed jobs into the report cache until killed'''
+    reports.warm()
+    job_repo = api.get_report_job_repository()
+    order_repo = api.get_order_repository()
+    report_cache = api.get_report_cache()
+    while True:
+        close_old_connections()
+        job = job_repo.claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        try:
+            order = order_repo.get_full_order_or_404(job.order_id)
+            key, _ = report_cache.get_or_render(order)
+        except Exception:
+            job_repo.fail(job, traceback.format_exc())
+        else:
+            job_repo.finish(job, key)
+
+
+class Command(BaseCommand):
+    help = ('Renders queued and idle orders into the report cache ahead of download, '
+            'and keeps the blank order pool filled')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Rendering processes to run')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between queue checks')
+        parser.add_argument('--idle-minutes', type=int, default=10,
+                            help='Queue orders once they have not been edited for this long')
+        parser.add_argument('--lookback-hours', type=int, default=24,
+                            help='Ignore orders last edited or completed before this many hours ago')
+
+    def handle(self, *args, **options):
+        # Connections must not be shared with the forked workers
+        connections.close_all()
+        workers = [
+            Process(target=render_jobs, args=(options['poll_interval'],), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        job_repo = api.get_report_job_repository()
+        order_repo = api.get_order_repository()
+        idle = timedelta(minutes=options['idle_minutes'])
+        lookback = timedelta(hours=options['lookback_hours'])
+        while all(worker.is_alive() for worker in workers):
+            close_old_connections()
+            now = timezone.now()
+            job_repo.requeue_stalled(now - idle)
+            queued = job_repo.enqueue_idle_orders(idle_since=now - idle, edited_since=now - lookback)
+            if queued:
+                self.stdout.write(f'Queued {len(queued)} idle orders')
+            job_repo.delete_finished(now - timedelta(days=7))
+            order_repo.refill_order_pool(settings.ORDER_POOL_SIZE)
+            time.sleep(options['poll_interval'])
+        raise SystemExit('A report worker exited')
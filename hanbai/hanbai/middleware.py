@@ -0,0 +1,26 @@
+import asyncio
+
+from django.utils.decorators import sync_and_async_middleware
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+@sync_and_async_middleware
+def static_files_middleware(get_response):
+    '''
+    WhiteNoiseMiddleware, which only runs synchronously, made to run in an async chain as well.
+    Django 3.1 runs the rest of the chain below a sync-only middleware, async views included,
+    on its one sync thread, which would then be held for the whole of every view.
+    '''
+    whitenoise = WhiteNoiseMiddleware(get_response)
+    if not asyncio.iscoroutinefunction(get_response):
+        return whitenoise
+
+    async def middleware(request):
+        if whitenoise.autorefresh:
+            static_file = whitenoise.find_file(request.path_info)
+        else:
+            static_file = whitenoise.files.get(request.path_info)
+        if static_file is not None:
+            return whitenoise.serve(static_file, request)
+        return await get_response(request)
+    return middleware
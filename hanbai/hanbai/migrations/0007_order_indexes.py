@@ -0,0 +1,21 @@
+# Generated by Django 3.1.5 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hanbai', '0006_order_archived'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(archived=False), fields=['-last_edited', '-id'], name='order_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('archived', False), ('completed__isnull', True)), fields=['-last_edited'], name='order_in_progress_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.5 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hanbai', '0008_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pooled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(pooled=True), fields=['id'], name='order_pool_idx'),
+        ),
+    ]
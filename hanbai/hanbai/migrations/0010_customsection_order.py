@@ -0,0 +1,29 @@
+# Generated by Django 3.1.5 on 2026-10-18 09:28
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def link_sections(apps, schema_editor):
+    CustomSection = apps.get_model('hanbai', 'CustomSection')
+    Order = apps.get_model('hanbai', 'Order')
+    for lookup in ['itemization__accessories', 'itemization__custom_specs', 'itemization__consumption_tax__extras']:
+        owners = Order.objects.filter(**{lookup: OuterRef('pk')}).values('pk')[:1]
+        CustomSection.objects.filter(order__isnull=True).update(order=Subquery(owners))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hanbai', '0009_order_pooled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customsection',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sections', to='hanbai.order'),
+        ),
+        migrations.RunPython(link_sections, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.5 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hanbai', '0011_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(archived=False), fields=['started'], name='order_started_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hanbai', '0013_order_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='autosave_seq',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
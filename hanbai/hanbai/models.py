@@ -1,5 +1,61 @@
 from django.core import validators
 from django.db import models
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .totals import OrderTotals, TOTALS_FIELDS
+
+
+class VersionConflict(Exception):
+    '''Another save changed the row after the version a save was based on'''
+
+
+class VersionedModel(models.Model):
+    '''Rows edited by several people at once, saved with optimistic concurrency control'''
+    # Bumped by every save_changes
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save_changes(self, field_names, version=None):
+        '''
+        Writes only the named fields, in one UPDATE conditional on the row still being at version
+        (by default the version this instance was loaded at). Saves to other fields of the row in between
+        are kept, and a save based on an older version raises VersionConflict without writing anything.
+        '''
+        if version is None:
+            version = self.version
+        values = {}
+        for name in field_names:
+            field = self._meta.get_field(name)
+            values[field.attname] = getattr(self, field.attname)
+        updated = type(self)._base_manager.filter(pk=self.pk, version=version).update(
+            version=F('version') + 1,
+            **values,
+        )
+        if not updated:
+            raise VersionConflict(f'{self._meta.object_name} {self.pk} has changed since version {version}')
+        self.version = version + 1
+
+
+class ExtraFieldQuerySet(models.QuerySet):
+    def integer_aggregates(self, section_ids):
+        '''
+        Integer totals of every given section, keyed by section id.
+        All sections are summed by a single grouped query.
+        '''
+        totals = dict.fromkeys(section_ids, 0)
+        if not totals:
+            return totals
+        rows = self.filter(
+            section__in=totals.keys(),
+            value_type=ExtraField.FieldTypeChoices.INTEGER,
+            integer_value__isnull=False,
+        ).order_by().values('section').annotate(total=Sum('integer_value'))
+        totals.update((row['section'], row['total']) for row in rows)
+        return totals
 
 
 class ExtraField(models.Model):
@@ -17,6 +73,15 @@ class ExtraField(models.Model):
         related_name='fields',
     )
 
+    objects = ExtraFieldQuerySet.as_manager()
+
+    @property
+    def totals_contribution(self):
+        '''What this field adds to its section's total, as summed by integer_aggregates'''
+        if self.value_type == self.FieldTypeChoices.INTEGER and self.integer_value is not None:
+            return self.integer_value
+        return 0
+
     @property
     def value(self):
         if self.value_type == self.FieldTypeChoices.STRING:
@@ -25,7 +90,7 @@ class ExtraField(models.Model):
             return self.integer_value
 
 
-class BasicVehicleInfo(models.Model):
+class BasicVehicleInfo(VersionedModel):
     class YearChoices(models.TextChoices):
         SEIREKI = '西', '西暦'
         SHOWA = '昭', '昭和'
@@ -83,7 +148,7 @@ class PreviousVehicleInfo(BasicVehicleInfo):
     classification = models.CharField('類別', max_length=255, blank=True)
 
 
-class CustomerInfo(models.Model):
+class CustomerInfo(VersionedModel):
     '''ご購入者(ごこうにゅうしゃ）'''
     name = models.CharField('氏名', max_length=255, blank=True)
     name_furi = models.CharField('フリガナ', max_length=255, blank=True)
@@ -96,7 +161,7 @@ class CustomerInfo(models.Model):
     contact_phone = models.CharField('連絡先', max_length=12, blank=True)
 
 
-class RegisteredHolderInfo(models.Model):
+class RegisteredHolderInfo(VersionedModel):
     '''登録名義人（とうろくめいぎにん）'''
     name = models.CharField('氏名', max_length=255, blank=True)
     name_furi = models.CharField('フリガナ', max_length=255, blank=True)
@@ -113,15 +178,17 @@ class CustomSection(models.Model):
     Ultimately, it is a 1-to-many to extra fields from the parent model, but only one foreign key field.
     '''
     section_name = models.CharField(max_length=255, blank=True)
-
-    def integer_aggregate(self):
-        return sum(self.fields.filter(
-            value_type=ExtraField.FieldTypeChoices.INTEGER,
-            integer_value__isnull=False,
-        ).values_list('integer_value', flat=True))
+    # Denormalized owner of the section, kept by OrderRepository so autosaves find the order directly
+    order = models.ForeignKey(
+        'Order',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='sections',
+    )
 
 
-class InsuranceTax(models.Model):
+class InsuranceTax(VersionedModel):
     '''税金・保険料'''
     vehicle_tax = models.PositiveIntegerField('自動車税', null=True, blank=True)
     acquisition_tax = models.PositiveIntegerField('得得税', null=True, blank=True)
@@ -141,8 +208,12 @@ class InsuranceTax(models.Model):
             self.stamp_duty,
         ]])
 
+    def totals_inputs(self):
+        '''What this instance feeds into OrderTotals.calculate'''
+        return {'insurance_tax': self.total}
+
 
-class ConsumptionTax(models.Model):
+class ConsumptionTax(VersionedModel):
     '''消費税課税対象'''
     # 手続代行費用
     inspection_registration_delivery_tax = models.PositiveIntegerField('検査・登録・届出', null=True, blank=True)
@@ -162,7 +233,8 @@ class ConsumptionTax(models.Model):
     )
 
     @property
-    def total(self):
+    def fields_total(self):
+        '''Total of the fixed fields only, without 追加項目'''
         return sum([field or 0 for field in [
             self.inspection_registration_delivery_tax,
             self.proof_of_storage_space,
@@ -172,11 +244,14 @@ class ConsumptionTax(models.Model):
             self.remaining_vehicle_tax,
             self.remaining_liability,
             self.recycle_management_fee,
-            self.extras.integer_aggregate(),
         ]])
 
+    def totals_inputs(self):
+        '''What this instance feeds into OrderTotals.calculate; 追加項目 are ExtraFields of their own'''
+        return {'consumption_tax': self.fields_total}
 
-class TaxExemption(models.Model):
+
+class TaxExemption(VersionedModel):
     '''非課税'''
     # 預り法定費用
     inspection_registration_delivery_exemption = models.PositiveIntegerField('怨嗟・登録・届出', null=True, blank=True)
@@ -193,8 +268,12 @@ class TaxExemption(models.Model):
             self.recycle_deposit
         ]])
 
+    def totals_inputs(self):
+        '''What this instance feeds into OrderTotals.calculate'''
+        return {'tax_exemption': self.total}
+
 
-class Itemization(models.Model):
+class Itemization(VersionedModel):
     '''
     Number comments correspond to numbers on original sheet
     '''
@@ -239,74 +318,93 @@ class Itemization(models.Model):
     trade_in_price = models.PositiveIntegerField('下取者価格', null=True, blank=True)  # 16
     # 残金 is aggregate of 14, 15, 16
 
+    def totals_inputs(self):
+        '''What this instance feeds into OrderTotals.calculate, sections aside'''
+        return {
+            'vehicle_price': self.vehicle_price or 0,
+            'special_discount': self.special_discount or 0,
+            'trade_in_price': self.trade_in_price or 0,
+        }
+
+    @property
+    def section_ids(self):
+        '''IDs of every CustomSection belonging to this itemization'''
+        return [self.accessories_id, self.custom_specs_id, self.consumption_tax.extras_id]
+
+    @cached_property
+    def totals(self):
+        aggregates = ExtraField.objects.integer_aggregates(self.section_ids)
+        return OrderTotals.from_itemization(self, aggregates)
+
+    @classmethod
+    def bulk_totals(cls, itemizations):
+        '''
+        Totals for many itemizations, keyed by itemization id.
+        Section sums for all of them come from a single grouped query.
+        '''
+        itemizations = list(itemizations)
+        aggregates = ExtraField.objects.integer_aggregates([
+            section_id
+            for itemization in itemizations
+            for section_id in itemization.section_ids
+        ])
+        for itemization in itemizations:
+            itemization.totals = OrderTotals.from_itemization(itemization, aggregates)
+        return {itemization.pk: itemization.totals for itemization in itemizations}
+
     @property
     def subtotal(self):
         '''4: 車両本体課税対象額'''
-        vehicle_price = self.vehicle_price or 0
-        special_discount = self.special_discount or 0
-        return (vehicle_price - special_discount) or None
+        return self.totals.subtotal
 
     @property
     def accessories_total(self):
         '''5: 付属品価格'''
-        return self.accessories.integer_aggregate() or None
+        return self.totals.accessories_total
 
     @property
     def custom_specs_total(self):
         '''6: 特別仕様価格'''
-        return self.custom_specs.integer_aggregate() or None
+        return self.totals.custom_specs_total
 
     @property
     def total_sale_price(self):
         '''9: 車両販売価格'''
-        subtotal = self.subtotal or 0
-        accessories = self.accessories_total or 0
-        custom_specs = self.custom_specs_total or 0
-        return subtotal + accessories + custom_specs
+        return self.totals.total_sale_price
 
     @property
     def insurance_tax_total(self):
         '''10: 税金・保険料'''
-        return self.insurance_tax.total or None
+        return self.totals.insurance_tax_total
 
     @property
     def consumption_tax_total(self):
         '''11: 消費税課税対象（課税)'''
-        return self.consumption_tax.total or None
+        return self.totals.consumption_tax_total
 
     @property
     def tax_exemption_total(self):
         '''12: 消費税課税対象（非課税)'''
-        return self.consumption_tax_exemption.total or None
+        return self.totals.tax_exemption_total
 
     @property
     def all_tax_total(self):
         '''13: 消費税合計 (9 + 11 - 16)'''
-        # TODO:: what is 16?
-        return self.all_total
+        return self.totals.all_tax_total
 
     @property
     def taxable_total(self):
         '''(9 + 10 + 11)'''
-        return sum([
-            self.total_sale_price or 0,
-            self.insurance_tax_total or 0,
-            self.consumption_tax_total or 0,
-        ])
+        return self.totals.taxable_total
 
     @property
     def all_total(self):
         '''14 合計 ( 9 + 10 + 11 + 12)'''
-        return sum(filter(None, [self.taxable_total, self.tax_exemption_total]))
+        return self.totals.all_total
 
     @property
     def final_total(self):
-        total = sum(filter(None, [
-            self.total_sale_price,
-            self.taxable_total,
-            self.all_tax_total
-        ])) or 0
-        return total - (self.trade_in_price or 0)
+        return self.totals.final_total
 
 
 class PaymentDetails(models.Model):
@@ -319,12 +417,14 @@ class PaymentDetails(models.Model):
     credit_card_company = models.CharField('クレジット会社名', max_length=255, blank=True)
 
 
-class Order(models.Model):
+class Order(VersionedModel):
     '''注文書'''
     started = models.DateTimeField()
     last_edited = models.DateTimeField(null=True, blank=True)
     completed = models.DateTimeField(null=True, blank=True)
     archived = models.BooleanField(default=False)
+    # Blank, unclaimed order kept ready by OrderRepository.refill_order_pool. Pooled orders are also archived.
+    pooled = models.BooleanField(default=False)
 
     # SellerAddress? (父さん会社情報)
     vehicle_info = models.OneToOneField(
@@ -360,24 +460,110 @@ class Order(models.Model):
     notes = models.TextField('備考', blank=True)
     person_in_charge = models.CharField('担当者', max_length=255, blank=True)
 
+    # Materialized Itemization.totals, kept by OrderRepository.refresh_totals and apply_totals_delta
+    subtotal = models.IntegerField(null=True, blank=True, editable=False)
+    accessories_total = models.IntegerField(null=True, blank=True, editable=False)
+    custom_specs_total = models.IntegerField(null=True, blank=True, editable=False)
+    total_sale_price = models.IntegerField(null=True, blank=True, editable=False)
+    insurance_tax_total = models.IntegerField(null=True, blank=True, editable=False)
+    consumption_tax_total = models.IntegerField(null=True, blank=True, editable=False)
+    tax_exemption_total = models.IntegerField(null=True, blank=True, editable=False)
+    all_tax_total = models.IntegerField(null=True, blank=True, editable=False)
+    taxable_total = models.IntegerField(null=True, blank=True, editable=False)
+    all_total = models.IntegerField(null=True, blank=True, editable=False)
+    trade_in_price = models.IntegerField(null=True, blank=True, editable=False)
+    final_total = models.IntegerField(null=True, blank=True, editable=False)
+    # Null until the totals above have been computed
+    totals_updated = models.DateTimeField(null=True, blank=True, editable=False)
+    # Bumped on every change to the order or its extra fields; keys TotalsCache entries
+    revision = models.PositiveIntegerField(default=0, editable=False)
+    # Highest autosave sequence number applied; saves numbered at or below it are dropped as stale
+    autosave_seq = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # OrderRepository.get_order_list_page
+            models.Index(fields=['-last_edited', '-id'], condition=Q(archived=False), name='order_list_idx'),
+            # OrderRepository.get_in_progress_order
+            models.Index(fields=['-last_edited'], condition=Q(archived=False, completed__isnull=True),
+                         name='order_in_progress_idx'),
+            # OrderRepository.get_sales_summary and get_order_ids
+            models.Index(fields=['started'], condition=Q(archived=False), name='order_started_idx'),
+            # OrderRepository.claim_pooled_order
+            models.Index(fields=['id'], condition=Q(pooled=True), name='order_pool_idx'),
+        ]
+
+    @property
+    def totals(self):
+        return self.itemization.totals
+
+    @property
+    def stored_totals(self):
+        '''The materialized totals, read from this row alone, or None if never computed'''
+        if self.totals_updated is None:
+            return None
+        return OrderTotals(**{name: getattr(self, name) for name in TOTALS_FIELDS})
+
     def json(self):
-        ret = {
+        return {
             'id': self.pk,
-            'itemization': {
-                'total_sale_price': self.itemization.total_sale_price,
-                'taxable_total': self.itemization.taxable_total,
-                'all_tax_total': self.itemization.all_tax_total,
-                'subtotal': self.itemization.subtotal,
-                'accessories_total': self.itemization.accessories_total,
-                'custom_specs_total': self.itemization.custom_specs_total,
-                'insurance_tax_total': self.itemization.insurance_tax_total,
-                'consumption_tax_total': self.itemization.consumption_tax_total,
-                'tax_exemption_total': self.itemization.tax_exemption_total,
-                'all_total': self.itemization.all_total,
-                'final_total': self.itemization.final_total,
-                'trade_in_price': self.itemization.trade_in_price,
-            },
+            'itemization': self.totals.json(),
         }
-        for k, v in ret['itemization'].items():
-            ret['itemization'][k] = v or 0
-        return ret
+
+    def snapshot(self):
+        '''
+        Every stored value of the order and its related objects, as plain data.
+        Bookkeeping columns are left out since saving unchanged values still bumps them.
+        '''
+        itemization = self.itemization
+        order = _field_values(self)
+        for name in ('last_edited', 'totals_updated', 'revision', 'autosave_seq'):
+            del order[name]
+        return {
+            'order': order,
+            'vehicle_info': _field_values(self.vehicle_info),
+            'previous_vehicle_info': _field_values(self.previous_vehicle_info),
+            'customer_info': _field_values(self.customer_info),
+            'registered_holder_info': _field_values(self.registered_holder_info),
+            'payment_details': _field_values(self.payment_details),
+            'itemization': _field_values(itemization),
+            'insurance_tax': _field_values(itemization.insurance_tax),
+            'consumption_tax': _field_values(itemization.consumption_tax),
+            'tax_exemption': _field_values(itemization.consumption_tax_exemption),
+            'accessories': [_field_values(field) for field in itemization.accessories.fields.all()],
+            'custom_specs': [_field_values(field) for field in itemization.custom_specs.fields.all()],
+            'consumption_tax_extras': [_field_values(field) for field in itemization.consumption_tax.extras.fields.all()],
+        }
+
+
+class ReportJob(models.Model):
+    '''OrderReport rendering queued for `manage.py report_worker`'''
+    class StatusChoices(models.IntegerChoices):
+        PENDING = 1
+        RUNNING = 2
+        DONE = 3
+        FAILED = 4
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='report_jobs',
+    )
+    status = models.IntegerField(choices=StatusChoices.choices, default=StatusChoices.PENDING.value)
+    created = models.DateTimeField(default=timezone.now)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    report_key = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # ReportJobRepository.claim_next; status 1 is StatusChoices.PENDING
+            models.Index(fields=['created'], condition=Q(status=1), name='report_job_pending_idx'),
+            # ReportJobRepository.enqueue_idle_orders
+            models.Index(fields=['order', 'created'], name='report_job_order_idx'),
+        ]
+
+
+def _field_values(instance):
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
@@ -0,0 +1,187 @@
+from hashlib import sha256
+from pathlib import Path
+from uuid import uuid4
+import json
+import os
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .reports import OrderReport, REPORT_LAYOUT_VERSION
+
+
+def report_key(order):
+    '''Content address of an order's PDF: changes whenever its data or the report layout does'''
+    content = json.dumps(
+        {'layout': REPORT_LAYOUT_VERSION, 'order': order.snapshot()},
+        sort_keys=True,
+        default=str,
+    )
+    return sha256(content.encode()).hexdigest()
+
+
+class BaseReportCache:
+    '''
+    Rendered OrderReport PDFs keyed by report_key.
+    Subclasses keep at most max_size bytes, evicting the least recently used reports first.
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, content):
+        raise NotImplementedError()
+
+    def has(self, key):
+        raise NotImplementedError()
+
+    def is_shared(self):
+        '''Whether reports stored by one process, such as report_worker, can be read by the web processes'''
+        raise NotImplementedError()
+
+    def get_or_render(self, order, key=None):
+        '''Returns (key, PDF bytes), rendering and storing the report on a miss'''
+        if key is None:
+            key = report_key(order)
+        content = self.get(key)
+        if content is None:
+            content = OrderReport(order).make_report().getvalue()
+            self.set(key, content)
+        return key, content
+
+
+class FileSystemReportCache(BaseReportCache):
+    '''One file per report; file modification times double as the LRU order'''
+    def __init__(self, location, max_size):
+        super().__init__(max_size)
+        self.location = Path(location)
+
+    def _path(self, key):
+        return self.location / f'{key}.pdf'
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def has(self, key):
+        return self._path(key).exists()
+
+    def is_shared(self):
+        # Only by processes on the same host, which separate dynos are not
+        return False
+
+    def set(self, key, content):
+        self.location.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self.location.glob('*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class DjangoReportCache(BaseReportCache):
+    '''
+    Stores reports in one of settings.CACHES.
+    The recency index is kept in the same cache, so it is shared by every process using it.
+    Reports never expire, so every stored one must be in the index to be evicted:
+    the index is only changed, and reports only stored, under a lock kept in the cache too.
+    '''
+    index_key = 'hanbai-report-index'
+    lock_key = 'hanbai-report-index-lock'
+    # Seconds until the lock of a process that died holding it is released anyway
+    lock_timeout = 10
+
+    def __init__(self, alias, max_size):
+        super().__init__(max_size)
+        self.cache = caches[alias]
+
+    def _content_key(self, key):
+        return f'hanbai-report:{key}'
+
+    def _lock(self, wait):
+        '''Takes the index lock, returning a token for _unlock, or None if it was not free within wait seconds'''
+        token = uuid4().hex
+        deadline = time.monotonic() + wait
+        # add() only sets a key that is not there, atomically
+        while not self.cache.add(self.lock_key, token, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+        return token
+
+    def _unlock(self, token):
+        # After lock_timeout the lock may be someone else's
+        if self.cache.get(self.lock_key) == token:
+            self.cache.delete(self.lock_key)
+
+    def _touch(self, key, size):
+        '''
+        Moves key to the most recently used end of the index, then evicts over max_size.
+        Callers hold the index lock.
+        '''
+        index = [entry for entry in self.cache.get(self.index_key, []) if entry[0] != key]
+        index.append((key, size))
+        total = sum(entry_size for _, entry_size in index)
+        while total > self.max_size and len(index) > 1:
+            evicted_key, evicted_size = index.pop(0)
+            self.cache.delete(self._content_key(evicted_key))
+            total -= evicted_size
+        self.cache.set(self.index_key, index, None)
+
+    def get(self, key):
+        content = self.cache.get(self._content_key(key))
+        if content is not None:
+            # The report is indexed already; when the lock is busy it only keeps its older place
+            token = self._lock(wait=0.1)
+            if token is not None:
+                try:
+                    self._touch(key, len(content))
+                finally:
+                    self._unlock(token)
+        return content
+
+    def has(self, key):
+        return self._content_key(key) in self.cache
+
+    def is_shared(self):
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    def set(self, key, content):
+        token = self._lock(wait=5)
+        if token is None:
+            # Left unstored rather than stored where eviction cannot find it
+            return
+        try:
+            self.cache.set(self._content_key(key), content, None)
+            self._touch(key, len(content))
+        finally:
+            self._unlock(token)
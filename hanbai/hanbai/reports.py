@@ -1,4 +1,6 @@
 from copy import deepcopy
+from dataclasses import dataclass
+from functools import lru_cache
 from io import BytesIO
 from typing import Optional
 import textwrap
@@ -6,9 +8,9 @@ from xml.sax.saxutils import escape
 
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table as BoxTable, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, PageBreak, Spacer, Table as BoxTable, TableStyle, Image
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
 from reportlab.lib import enums, colors
 
 from django.conf import settings
@@ -35,6 +37,12 @@ LIGHT_COLOR = '#ADDAEF'
 MID_COLOR = '#97BFD1'
 DARK_COLOR = '#479CC6'
 
+# Bump whenever a change alters the rendered PDF, so cached reports are not reused
+REPORT_LAYOUT_VERSION = 2
+
+FONT_NAME = 'NotoSerifJP-Regular'
+BOLD_FONT_NAME = 'NotoSerifJP-Bold'
+
 
 class Table(BoxTable):
     def _drawBox(self,  start, end, weight, color, count, space):
@@ -44,46 +52,95 @@ class Table(BoxTable):
         self.canv.roundRect(sc, sr, self._width, self._height, 2.5)
 
 
+@lru_cache(maxsize=None)
+def register_fonts():
+    '''Parses the CJK fonts and registers them with ReportLab, once per process'''
+    for font_name in [FONT_NAME, BOLD_FONT_NAME]:
+        pdfmetrics.registerFont(TTFont(font_name, f'hanbai/static/fonts/{font_name}.ttf'))
+
+
+@dataclass(frozen=True)
+class ReportStyles:
+    '''
+    Styles shared by every OrderReport in the process.
+    The styles are shared instances: copy one before changing it.
+    '''
+    styles: StyleSheet1
+    normal_style: ParagraphStyle
+    small_style: ParagraphStyle
+    center_style: ParagraphStyle
+    right_style: ParagraphStyle
+    totals_style: ParagraphStyle
+    floating_tablestyle: tuple
+    basic_tablestyle: tuple
+
+
+@lru_cache(maxsize=None)
+def get_report_styles():
+    register_fonts()
+    # TODO:: Manullay declaring is probably better
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = FONT_NAME
+    normal_style = styles['Normal']
+    normal_style.fontSize = 5
+    normal_style.leading = 6
+    small_style = deepcopy(normal_style)
+    small_style.fontSize = 4
+    center_style = deepcopy(styles['Normal'])
+    center_style.alignment = enums.TA_CENTER
+    right_style = deepcopy(normal_style)
+    right_style.alignment = enums.TA_RIGHT
+    styles['Heading4'].fontName = BOLD_FONT_NAME
+    styles['Heading4'].fontSize = 6
+    floating_tablestyle = (
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    )
+    basic_tablestyle = floating_tablestyle + (
+        ('INNERGRID', (0, 0), (-1, -1), 0.25, MID_COLOR),
+        ('BOX', (0, 0), (-1, -1), .5, MID_COLOR),
+    )
+    totals_style = deepcopy(styles['Normal'])
+    totals_style.fontSize = 7
+    totals_style.alignment = enums.TA_CENTER
+    return ReportStyles(
+        styles=styles,
+        normal_style=normal_style,
+        small_style=small_style,
+        center_style=center_style,
+        right_style=right_style,
+        totals_style=totals_style,
+        floating_tablestyle=floating_tablestyle,
+        basic_tablestyle=basic_tablestyle,
+    )
+
+
+def warm():
+    '''Loads fonts and styles ahead of the first report, e.g. when a worker boots'''
+    get_report_styles()
+
+
 class OrderReport:
     def __init__(self, order):
         self.order = order
+        self.totals = order.totals
         # Configuration
-        self.font_name = 'NotoSerifJP-Regular'
-        self.bold_font_name = 'NotoSerifJP-Bold'
-        pdfmetrics.registerFont(TTFont(self.font_name, f'hanbai/static/fonts/{self.font_name}.ttf'))
-        pdfmetrics.registerFont(TTFont(self.bold_font_name, f'hanbai/static/fonts/{self.bold_font_name}.ttf'))
-
-        # TODO:: Manullay declaring is probably better
-        self.styles = getSampleStyleSheet()
-        for style in self.styles.byName.values():
-            style.fontName = self.font_name
-        self.normal_style = self.styles['Normal']
-        self.normal_style.fontSize = 5
-        self.normal_style.leading = 6
-        self.small_style = deepcopy(self.normal_style)
-        self.small_style.fontSize = 4
-        self.center_style = deepcopy(self.styles['Normal'])
-        self.center_style.alignment = enums.TA_CENTER
-        self.right_style = deepcopy(self.normal_style)
-        self.right_style.alignment = enums.TA_RIGHT
-        
+        self.font_name = FONT_NAME
+        self.bold_font_name = BOLD_FONT_NAME
+        report_styles = get_report_styles()
+        self.styles = report_styles.styles
+        self.normal_style = report_styles.normal_style
+        self.small_style = report_styles.small_style
+        self.center_style = report_styles.center_style
+        self.right_style = report_styles.right_style
+
         self.textarea_width = 12  # TODO:: Set actual width
         self.vertical_style = self.normal_style
-        self.styles['Heading4'].fontName = self.bold_font_name
-        self.styles['Heading4'].fontSize = 6
-        self.floating_tablestyle = [
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]
-        self.basic_tablestyle = deepcopy(self.floating_tablestyle)
-        self.basic_tablestyle += [
-            ('INNERGRID', (0, 0), (-1, -1), 0.25, MID_COLOR),
-            ('BOX', (0, 0), (-1, -1), .5, MID_COLOR),
-        ]
-        self.totals_style = deepcopy(self.styles['Normal'])
-        self.totals_style.fontSize = 7
-        self.totals_style.alignment = enums.TA_CENTER
+        self.floating_tablestyle = list(report_styles.floating_tablestyle)
+        self.basic_tablestyle = list(report_styles.basic_tablestyle)
+        self.totals_style = report_styles.totals_style
 
         # Report instance instantiation
         self.basic_spacer = Spacer(1, 12)
@@ -98,6 +155,11 @@ class OrderReport:
         )
 
     def make_report(self):
+        self.doc.build(self.make_content())
+        self.doc_target.seek(0)
+        return self.doc_target
+
+    def make_content(self):
         # create the components in order & add them to report here.
         # Each component section should just return a table or paragraph;
         # Adding to the table will be done here.
@@ -107,10 +169,23 @@ class OrderReport:
         main_content.append(self.middle_table())
         main_content.append(self.basic_spacer)
         main_content.append(self.bottom_table())
-
-        self.doc.build(main_content)
-        self.doc_target.seek(0)
-        return self.doc_target
+        return main_content
+
+    @classmethod
+    def make_combined_report(cls, orders):
+        '''One PDF with a page per order, in the given order'''
+        reports = [cls(order) for order in orders]
+        if not reports:
+            return None
+        main_content = []
+        for report in reports:
+            main_content += report.make_content()
+            main_content.append(PageBreak())
+        # The first report's document has the same page setup as every other
+        doc_report = reports[0]
+        doc_report.doc.build(main_content[:-1])
+        doc_report.doc_target.seek(0)
+        return doc_report.doc_target
 
     def upper_table(self):
         '''
@@ -154,12 +229,16 @@ class OrderReport:
         '''
         [お支払い現金合計] = [車輌販売価額] + [諸費用合計] + [消費税合計] - [下取車価額]
         '''
-        # TODO:: actual numbres
-        sale_price = 2137880
-        expenses = 831200
-        consumption_tax = 0
-        previous_vehicle_cost = 0
-        total = sale_price + expenses
+        sale_price = self.totals.total_sale_price
+        # (10)+(11)+(12), as the cell is labelled; taxable_total would count the vehicle price (9) twice
+        expenses = sum(filter(None, [
+            self.totals.insurance_tax_total,
+            self.totals.consumption_tax_total,
+            self.totals.tax_exemption_total,
+        ]))
+        consumption_tax = self.totals.all_tax_total
+        previous_vehicle_cost = self.totals.trade_in_price or 0
+        total = self.totals.final_total
         header_style = self.totals_style
         number_style = deepcopy(header_style)
         number_style.alignment = enums.TA_RIGHT
@@ -435,18 +514,19 @@ class OrderReport:
         info = self.order.itemization
         cell_from_fieldname = self._cell_from_fieldname(info)
         cell_from_fieldval = self._cell_from_fieldval(info, global_style=self.right_style)
+        cell_from_total = self._cell_from_fieldval(self.totals, global_style=self.right_style)
         table = Table([
             [cell_from_fieldname('vehicle_price'), cell_from_fieldval('vehicle_price')],
             [cell_from_fieldname('special_discount'), cell_from_fieldval('special_discount')],
-            [Paragraph('車両本体課税対象額 (1 + 2 + 3)', self.normal_style), cell_from_fieldval('subtotal')],
-            [Paragraph('付属品価格 (5)', self.normal_style), cell_from_fieldval('accessories_total')],
-            [Paragraph('特別仕様価格 (6)', self.normal_style), cell_from_fieldval('custom_specs_total')],
-            [Paragraph('車両販売価格 (4 + 5 + 6+ 7+ 8)', self.normal_style), cell_from_fieldval('total_sale_price')],
-            [Paragraph('税金・保険料 (10)', self.normal_style), cell_from_fieldval('insurance_tax_total')],
-            [Paragraph('消費税課税対象（課税) (11)', self.normal_style), cell_from_fieldval('consumption_tax_total')],
-            [Paragraph('消費税課税対象（非課税) (12)', self.normal_style), cell_from_fieldval('tax_exemption_total')],
-            [Paragraph('消費税合計 (13)', self.normal_style), cell_from_fieldval('all_tax_total')],
-            [Paragraph('合計 (14)', self.normal_style), cell_from_fieldval('all_total')],
+            [Paragraph('車両本体課税対象額 (1 + 2 + 3)', self.normal_style), cell_from_total('subtotal')],
+            [Paragraph('付属品価格 (5)', self.normal_style), cell_from_total('accessories_total')],
+            [Paragraph('特別仕様価格 (6)', self.normal_style), cell_from_total('custom_specs_total')],
+            [Paragraph('車両販売価格 (4 + 5 + 6+ 7+ 8)', self.normal_style), cell_from_total('total_sale_price')],
+            [Paragraph('税金・保険料 (10)', self.normal_style), cell_from_total('insurance_tax_total')],
+            [Paragraph('消費税課税対象（課税) (11)', self.normal_style), cell_from_total('consumption_tax_total')],
+            [Paragraph('消費税課税対象（非課税) (12)', self.normal_style), cell_from_total('tax_exemption_total')],
+            [Paragraph('消費税合計 (13)', self.normal_style), cell_from_total('all_tax_total')],
+            [Paragraph('合計 (14)', self.normal_style), cell_from_total('all_total')],
         ])
         style = deepcopy(self.basic_tablestyle)
         style += [
@@ -516,7 +596,7 @@ class OrderReport:
             ['', cell_from_fieldname('vehicle_liability_insurance'), cell_from_fieldval('vehicle_liability_insurance')],
             ['', cell_from_fieldname('optional_insurance'), cell_from_fieldval('optional_insurance')],
             ['', cell_from_fieldname('stamp_duty'), cell_from_fieldval('stamp_duty')],
-            ['', Paragraph('計 (10)', self.center_style), Paragraph(str(info.total), self.right_style)],
+            ['', Paragraph('計 (10)', self.center_style), Paragraph(str(self.totals.insurance_tax_total or 0), self.right_style)],
         ], colWidths=[THIRTY2NDS, (THIRDS // 2) - THIRTY2NDS, (THIRDS // 2) - THIRTY2NDS])
         style = deepcopy(self.basic_tablestyle)
         style += [
@@ -546,7 +626,8 @@ class OrderReport:
             ['', cell_from_fieldname('remaining_liability'), '', cell_from_fieldval('remaining_liability')],
             ['', cell_from_fieldname('recycle_management_fee'), '', cell_from_fieldval('recycle_management_fee')],
         ] + self.cells_from_extras(info.extras, leading=1)
-        rows += [['', Paragraph('計 (11)', self.center_style), Paragraph(str(info.total), self.right_style)]]
+        rows += [['', Paragraph('計 (11)', self.center_style),
+                  Paragraph(str(self.totals.consumption_tax_total or 0), self.right_style)]]
         table = Table(
             rows,
             colWidths=[
@@ -589,7 +670,8 @@ class OrderReport:
              cell_from_fieldval('previous_vehicle_processing_exemption')],
             ['', cell_from_fieldname('recycle_deposit'), '', cell_from_fieldval('recycle_deposit')]
         ]
-        rows += [['', Paragraph('計 (12)', self.center_style), Paragraph(str(info.total), self.right_style)]]
+        rows += [['', Paragraph('計 (12)', self.center_style),
+                  Paragraph(str(self.totals.tax_exemption_total or 0), self.right_style)]]
         table = Table(
             rows,
             colWidths=[
@@ -618,7 +700,7 @@ class OrderReport:
 
     def accessories(self):
         itemized_rows = self.cells_from_extras(self.order.itemization.accessories, leading=1, min_length=10)
-        total = self.order.itemization.accessories_total
+        total = self.totals.accessories_total
         total = str(total) if total is not None else '0'
         rows = [
             [Paragraph('<br />'.join('付属品'), self.vertical_style), '', ''],
@@ -641,7 +723,7 @@ class OrderReport:
 
     def custom_specs(self):
         itemized_rows = self.cells_from_extras(self.order.itemization.custom_specs, leading=1, min_length=10)
-        total = self.order.itemization.custom_specs_total
+        total = self.totals.custom_specs_total
         total = str(total) if total is not None else '0'
         rows = [
             [Paragraph('<br />'.join('特別仕様'), self.vertical_style), '', ''],
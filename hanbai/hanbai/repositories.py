@@ -1,8 +1,106 @@
-from django.db import transaction
-from django.db.models import Q
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime, time, timedelta
+from itertools import islice
+import binascii
+
+from django.db import connections, transaction
+from django.db.models import (
+    Avg, Count, Exists, F, FloatField, OuterRef, Prefetch, Q, Sum, prefetch_related_objects,
+)
+from django.db.models.functions import TruncMonth
+from django.http import Http404
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.shortcuts import get_object_or_404
 
+from .decorators import database_sync_to_async
+from .totals import OrderTotals, TOTALS_FIELDS
+
+
+# Bookkeeping columns left out of iter_export_records, so the accounting feed does not change with them
+EXPORT_EXCLUDED_COLUMNS = frozenset(['version', 'archived', 'pooled', 'revision', 'autosave_seq', 'totals_updated'])
+
+
+def encode_cursor(last_edited, order_id):
+    last_edited = last_edited.isoformat() if last_edited else ''
+    return urlsafe_b64encode(f'{last_edited}|{order_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        last_edited, order_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return (datetime.fromisoformat(last_edited) if last_edited else None), int(order_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def _after_cursor(last_edited, order_id):
+    '''Rows that come after (last_edited, id) when ordered by both descending, nulls first'''
+    if last_edited is None:
+        return Q(last_edited__isnull=True, id__lt=order_id) | Q(last_edited__isnull=False)
+    # The redundant last_edited bound is the one Postgres can seek order_list_idx by;
+    # under the OR alone it scans the index from the top and filters, so deep pages cost more
+    return Q(last_edited__lte=last_edited) & (Q(last_edited__lt=last_edited) | Q(last_edited=last_edited, id__lt=order_id))
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class StaleAutosave(Exception):
+    '''A later autosave of the same order has already been applied'''
+    def __init__(self, autosave_seq):
+        super().__init__(f'Autosave {autosave_seq} has already been applied')
+        self.autosave_seq = autosave_seq
+
+
+def _copy(instance, **values):
+    '''Unsaved instance with the field values of instance, without its primary key. values are attnames.'''
+    fields = {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+    fields.update(values)
+    return type(instance)(**fields)
+
+
+class OrderHandle:
+    '''
+    Stands in for an Order whose row was updated without being loaded.
+    Totals are loaded on first use, through the totals cache.
+    '''
+    def __init__(self, repository, pk, last_edited):
+        self.repository = repository
+        self.pk = self.id = pk
+        self.last_edited = last_edited
+
+    @cached_property
+    def totals(self):
+        return self.repository.get_current_totals(self.pk)
+
+    @cached_property
+    def parts(self):
+        return self.repository.get_part_keys(self.pk)
+
+    def owns(self, instance):
+        '''Whether instance is the order, one of its sections, or an extra field of one of its custom sections'''
+        if isinstance(instance, self.repository.extra_field_model):
+            return (self.repository.custom_section_model, instance.section_id) in self.parts
+        return (type(instance), instance.pk) in self.parts
+
+    def apply_totals_delta(self, deltas, section_deltas=None):
+        '''Moves the stored totals by what a save changed, see OrderRepository.apply_totals_delta'''
+        self.totals = self.repository.apply_totals_delta(self.pk, deltas, section_deltas)
+
+    def json(self):
+        return {
+            'id': self.pk,
+            'itemization': self.totals.json(),
+        }
+
 
 class OrderRepository:
     def __init__(self,
@@ -16,7 +114,9 @@ class OrderRepository:
                  insurance_tax_model,
                  consumption_tax_model,
                  tax_exemption_model,
-                 payment_details_model):
+                 payment_details_model,
+                 extra_field_model,
+                 totals_cache=None):
         self.order_model = order_model
         self.previous_vehicle_info_model = previous_vehicle_info_model
         self.vehicle_info_model = vehicle_info_model
@@ -28,6 +128,8 @@ class OrderRepository:
         self.consumption_tax_model = consumption_tax_model
         self.tax_exemption_model = tax_exemption_model
         self.payment_details_model = payment_details_model
+        self.extra_field_model = extra_field_model
+        self.totals_cache = totals_cache
 
     def get_in_progress_order(self):
         try:
@@ -42,51 +144,497 @@ class OrderRepository:
         orders = self.order_model.objects.filter(archived=False)
         return orders.order_by('-last_edited', '-completed')
 
+    def get_order_list_rows(self):
+        '''Only the columns shown on the order list, in one joined query'''
+        return self.get_all_orders().values(
+            'id',
+            'started',
+            'last_edited',
+            'final_total',
+            car_name=F('vehicle_info__car_name'),
+            customer_name=F('customer_info__name'),
+        )
+
+    def get_order_list_page(self, cursor=None, page_size=50):
+        '''
+        One page of order list rows, never edited then most recently edited first,
+        and the cursor of the next page.
+        Pages are found by seeking past (last_edited, id) instead of OFFSET,
+        so any page costs the same however many orders there are.
+        Raises ValueError for a malformed cursor.
+        '''
+        # NULLS FIRST is the natural order of a descending index on Postgres, see Order.Meta.indexes
+        rows = self.get_order_list_rows().order_by(F('last_edited').desc(nulls_first=True), '-id')
+        if cursor:
+            rows = rows.filter(_after_cursor(*decode_cursor(cursor)))
+        rows = list(rows[:page_size + 1])
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1]['last_edited'], rows[-1]['id'])
+        return rows, next_cursor
+
+    def get_order_ids(self, order_ids=None, started_from=None, started_to=None):
+        '''IDs of unarchived orders, oldest first, narrowed by id and/or the date they were started'''
+        orders = self._started_between(started_from, started_to)
+        if order_ids is not None:
+            orders = orders.filter(pk__in=order_ids)
+        return list(orders.order_by('started', 'pk').values_list('pk', flat=True))
+
+    def get_sales_summary(self, group_by, started_from=None, started_to=None):
+        '''
+        Sales figures of unarchived orders, summed by the database from the stored totals, one dict per group.
+        group_by lists 'month' (the month an order was started) and/or 'person_in_charge'.
+        '''
+        orders = self._started_between(started_from, started_to)
+        # Truncated as a datetime, since the database only applies the current time zone to those
+        rows = list(
+            orders.annotate(month=TruncMonth('started'))
+            .values(*group_by)
+            .annotate(
+                orders=Count('pk'),
+                sales=Sum('final_total'),
+                average_discount=Avg('itemization__special_discount', output_field=FloatField()),
+                trade_in=Sum('trade_in_price'),
+                insurance_tax=Sum('insurance_tax_total'),
+                consumption_tax=Sum('consumption_tax_total'),
+                tax_exemption=Sum('tax_exemption_total'),
+            )
+            .order_by(*group_by)
+        )
+        if 'month' in group_by:
+            for row in rows:
+                row['month'] = timezone.localtime(row['month']).date()
+        return rows
+
+    def iter_export_records(self, started_from=None, started_to=None, chunk_size=500):
+        '''
+        Yields each unarchived order, oldest first, as a dict of its sections' field values
+        (keyed like Order.snapshot) plus lists of extra fields. Rows are streamed chunk_size
+        at a time, through a server-side cursor on Postgres, and the extra fields of each chunk
+        come from one more query, so memory does not grow with the number of orders.
+        '''
+        columns = {
+            section: {f'{prefix}{field.attname}': field.attname for field in model._meta.concrete_fields
+                      if not field.is_relation and field.attname not in EXPORT_EXCLUDED_COLUMNS}
+            for section, prefix, model in self._export_sections()
+        }
+        extras = {
+            'accessories': 'itemization__accessories',
+            'custom_specs': 'itemization__custom_specs',
+            'consumption_tax_extras': 'itemization__consumption_tax__extras',
+        }
+        rows = self._started_between(started_from, started_to).order_by('pk').values(
+            *(lookup for section_columns in columns.values() for lookup in section_columns),
+            *extras.values(),
+        ).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            fields = {}
+            section_ids = [row[lookup] for row in chunk for lookup in extras.values()]
+            for field in self.extra_field_model.objects.filter(section__in=section_ids).order_by('pk'):
+                fields.setdefault(field.section_id, []).append({'field_name': field.field_name, 'value': field.value})
+            for row in chunk:
+                record = {
+                    section: {name: row[lookup] for lookup, name in section_columns.items()}
+                    for section, section_columns in columns.items()
+                }
+                record.update((name, fields.get(row[lookup], [])) for name, lookup in extras.items())
+                yield record
+
+    def _export_sections(self):
+        return [
+            ('order', '', self.order_model),
+            ('vehicle_info', 'vehicle_info__', self.vehicle_info_model),
+            ('previous_vehicle_info', 'previous_vehicle_info__', self.previous_vehicle_info_model),
+            ('customer_info', 'customer_info__', self.customer_info_model),
+            ('registered_holder_info', 'registered_holder_info__', self.registered_holder_info_model),
+            ('payment_details', 'payment_details__', self.payment_details_model),
+            ('itemization', 'itemization__', self.itemization_model),
+            ('insurance_tax', 'itemization__insurance_tax__', self.insurance_tax_model),
+            ('consumption_tax', 'itemization__consumption_tax__', self.consumption_tax_model),
+            ('tax_exemption', 'itemization__consumption_tax_exemption__', self.tax_exemption_model),
+        ]
+
+    def _started_between(self, started_from, started_to):
+        '''Unarchived orders started on started_from to started_to, both local dates, bounded so order_started_idx applies'''
+        orders = self.order_model.objects.filter(archived=False)
+        if started_from is not None:
+            orders = orders.filter(started__gte=_local_midnight(started_from))
+        if started_to is not None:
+            orders = orders.filter(started__lt=_local_midnight(started_to + timedelta(days=1)))
+        return orders
+
     def get_order_or_404(self, order_id):
         return get_object_or_404(self.order_model, pk=order_id, archived=False)
 
-    def set_last_edited(self, order_id):
-        order = self.get_order_or_404(order_id)
-        order.last_edited = timezone.now()
-        order.save()
+    def get_full_order_or_404(self, order_id):
+        '''
+        The order with its whole one-to-one graph from one joined query, and the extra fields
+        of all three sections from one more. Its totals are worked out without further queries.
+        '''
+        order = get_object_or_404(self._full_orders(), pk=order_id, archived=False)
+        self._load_extra_fields([order])
         return order
 
+    def get_full_orders(self, order_ids):
+        '''get_full_order_or_404 for many orders at once, in order_ids order, skipping missing ones'''
+        orders = self._full_orders().filter(archived=False).in_bulk(order_ids)
+        orders = [orders[order_id] for order_id in order_ids if order_id in orders]
+        self._load_extra_fields(orders)
+        return orders
+
+    def _full_orders(self):
+        return self.order_model.objects.select_related(
+            'vehicle_info',
+            'previous_vehicle_info',
+            'customer_info',
+            'registered_holder_info',
+            'payment_details',
+            'itemization__accessories',
+            'itemization__custom_specs',
+            'itemization__insurance_tax',
+            'itemization__consumption_tax__extras',
+            'itemization__consumption_tax_exemption',
+        )
+
+    def _load_extra_fields(self, orders):
+        '''Fills section.fields.all() of every section of orders from one query, and sets their totals'''
+        sections = []
+        for order in orders:
+            itemization = order.itemization
+            sections += [itemization.accessories, itemization.custom_specs, itemization.consumption_tax.extras]
+        # The sections came from select_related, so one prefetch covers all three kinds
+        prefetch_related_objects(sections, Prefetch('fields', queryset=self.extra_field_model.objects.order_by('pk')))
+        aggregates = {
+            section.pk: sum(field.totals_contribution for field in section.fields.all())
+            for section in sections
+        }
+        for order in orders:
+            order.itemization.totals = OrderTotals.from_itemization(order.itemization, aggregates)
+
+    def get_order_totals(self, order_ids):
+        '''OrderTotals of many orders, keyed by order id, without per-section queries'''
+        orders = self.order_model.objects.filter(pk__in=order_ids).select_related(
+            'itemization__insurance_tax',
+            'itemization__consumption_tax',
+            'itemization__consumption_tax_exemption',
+        )
+        totals = self.itemization_model.bulk_totals(order.itemization for order in orders)
+        return {order.pk: totals[order.itemization_id] for order in orders}
+
+    def get_stored_totals(self, order_ids):
+        '''Materialized OrderTotals of many orders, keyed by order id; None where never computed'''
+        rows = self.order_model.objects.filter(pk__in=order_ids).values('pk', 'totals_updated', *TOTALS_FIELDS)
+        return {
+            row.pop('pk'): OrderTotals(**row) if row.pop('totals_updated') else None
+            for row in rows
+        }
+
+    def refresh_totals(self, order_id):
+        '''
+        Recomputes the order's totals and stores them on its row, returning them.
+        Call it in the same transaction as any save that changes what the totals depend on.
+        '''
+        totals = self._compute_totals(order_id)
+        self.order_model.objects.filter(pk=order_id).update(totals_updated=timezone.now(), **asdict(totals))
+        return totals
+
+    def apply_totals_delta(self, order_id, deltas, section_deltas=None):
+        '''
+        Moves the stored totals by how far each calculate() input moved, as found by totals_delta,
+        plus section_deltas keyed by CustomSection id, instead of summing every section again.
+        Falls back to refresh_totals when the order has no stored totals or the section is not its own.
+        Call it in the same transaction as the save. Returns the new totals.
+        '''
+        deltas = Counter(deltas)
+        section_deltas = {section_id: delta for section_id, delta in (section_deltas or {}).items() if delta}
+        if section_deltas:
+            sections = self.itemization_model.objects.filter(order=order_id).values(
+                'accessories',
+                'custom_specs',
+                'consumption_tax__extras',
+            ).get()
+            inputs = {
+                sections['accessories']: 'accessories',
+                sections['custom_specs']: 'custom_specs',
+                sections['consumption_tax__extras']: 'consumption_tax',
+            }
+            for section_id, delta in section_deltas.items():
+                if section_id not in inputs:
+                    return self.refresh_totals(order_id)
+                deltas[inputs[section_id]] += delta
+
+        order = self.order_model.objects.select_for_update().only(
+            'revision',
+            'totals_updated',
+            *TOTALS_FIELDS,
+        ).get(pk=order_id)
+        stored = order.stored_totals
+        if stored is None:
+            return self.refresh_totals(order_id)
+        totals = stored.apply_delta(deltas)
+        if totals != stored:
+            self.order_model.objects.filter(pk=order_id).update(totals_updated=timezone.now(), **asdict(totals))
+        self._cache_totals(order_id, order.revision, totals)
+        return totals
+
+    def get_current_totals(self, order_id):
+        '''
+        The order's totals, served by the totals cache unless the order changed since they were cached.
+        A hit reads only the order's revision, by primary key.
+        '''
+        revision = self.order_model.objects.filter(pk=order_id, archived=False).values_list('revision', flat=True).first()
+        if revision is None:
+            raise Http404(f'No {self.order_model._meta.object_name} matches the given query.')
+        totals = self.totals_cache.get(order_id, revision) if self.totals_cache else None
+        if totals is None:
+            totals = self._compute_totals(order_id)
+        return totals
+
+    async def aget_current_totals(self, order_id):
+        '''get_current_totals for async views'''
+        return await database_sync_to_async(self.get_current_totals)(order_id)
+
+    def _compute_totals(self, order_id):
+        '''Totals from the database, written through to the totals cache under the revision they were read at'''
+        itemization = self.get_itemization(order_id)
+        self._cache_totals(order_id, itemization.order_revision, itemization.totals)
+        return itemization.totals
+
+    def _cache_totals(self, order_id, revision, totals):
+        if self.totals_cache:
+            # A rolled back revision would be reused by the next change, so only committed ones are cached
+            transaction.on_commit(lambda: self.totals_cache.set(order_id, revision, totals))
+
+    def store_totals(self, totals):
+        '''Stores many already computed totals, given keyed by order id, in one UPDATE'''
+        now = timezone.now()
+        orders = [
+            self.order_model(pk=order_id, totals_updated=now, **asdict(order_totals))
+            for order_id, order_totals in totals.items()
+        ]
+        self.order_model.objects.bulk_update(orders, ['totals_updated', *TOTALS_FIELDS])
+
+    def set_last_edited(self, order_id, autosave_seq=None):
+        '''
+        Touches only last_edited and revision, in a single UPDATE, and returns an OrderHandle.
+        With autosave_seq, the UPDATE only applies if no save numbered at or above it has,
+        raising StaleAutosave otherwise; callers should then drop the save.
+        '''
+        last_edited = timezone.now()
+        orders = self.order_model.objects.filter(pk=order_id, archived=False)
+        values = {'last_edited': last_edited, 'revision': F('revision') + 1}
+        if autosave_seq is None:
+            updated = orders.update(**values)
+        else:
+            updated = orders.filter(autosave_seq__lt=autosave_seq).update(autosave_seq=autosave_seq, **values)
+            if not updated:
+                applied = orders.values_list('autosave_seq', flat=True).first()
+                if applied is not None:
+                    raise StaleAutosave(applied)
+        if not updated:
+            raise Http404(f'No {self.order_model._meta.object_name} matches the given query.')
+        return OrderHandle(self, order_id, last_edited)
+
+    def get_part_keys(self, order_id):
+        '''(model, primary key) of the order and of every section edited through its forms, read in one query'''
+        parts = {
+            'pk': self.order_model,
+            'vehicle_info': self.vehicle_info_model,
+            'previous_vehicle_info': self.previous_vehicle_info_model,
+            'customer_info': self.customer_info_model,
+            'registered_holder_info': self.registered_holder_info_model,
+            'itemization': self.itemization_model,
+            'itemization__insurance_tax': self.insurance_tax_model,
+            'itemization__consumption_tax': self.consumption_tax_model,
+            'itemization__consumption_tax_exemption': self.tax_exemption_model,
+            'itemization__accessories': self.custom_section_model,
+            'itemization__custom_specs': self.custom_section_model,
+            'itemization__consumption_tax__extras': self.custom_section_model,
+        }
+        row = self.order_model.objects.filter(pk=order_id).values(*parts).get()
+        return frozenset((model, row[lookup]) for lookup, model in parts.items())
+
+    def get_itemization(self, order_id):
+        '''
+        The order's itemization with everything its totals need except extra fields,
+        and the order's revision as order_revision
+        '''
+        return self.itemization_model.objects.select_related(
+            'insurance_tax',
+            'consumption_tax',
+            'consumption_tax_exemption',
+        ).annotate(order_revision=F('order__revision')).get(order=order_id)
+
     def delete_order(self, order_id):
-        order = self.get_order_or_404(order_id)
-        order.archived = True
-        order.save()
+        '''Archives the order in one UPDATE, leaving its stored totals and revision as they are'''
+        if not self.order_model.objects.filter(pk=order_id, archived=False).update(archived=True):
+            raise Http404(f'No {self.order_model._meta.object_name} matches the given query.')
 
-    @transaction.atomic()
     def initialize_new_order(self):
-        previous_vehicle_info = self.previous_vehicle_info_model.objects.create()
-        vehicle_info = self.vehicle_info_model.objects.create()
-        customer_info = self.customer_info_model.objects.create()
-        registered_holder_info = self.registered_holder_info_model.objects.create()
-        payment_details = self.payment_details_model.objects.create()
-        itemization = self.initialize_itemization()
-        return self.order_model.objects.create(
+        return self.initialize_new_orders(1)[0]
+
+    @transaction.atomic()
+    def initialize_new_orders(self, count, pooled=False):
+        '''
+        Creates count blank orders with one INSERT per model, whatever the count.
+        pooled orders wait, archived, for claim_pooled_order.
+        '''
+        itemizations = self.initialize_itemizations(count)
+        previous_vehicle_infos = self._create_blank(self.previous_vehicle_info_model, count)
+        vehicle_infos = self._create_blank(self.vehicle_info_model, count)
+        customer_infos = self._create_blank(self.customer_info_model, count)
+        registered_holder_infos = self._create_blank(self.registered_holder_info_model, count)
+        payment_details = self._create_blank(self.payment_details_model, count)
+        started = timezone.now()
+        blank_totals = asdict(OrderTotals.calculate())
+        orders = self._create(self.order_model, [
+            self.order_model(
+                started=started,
+                totals_updated=started,
+                **blank_totals,
+                archived=pooled,
+                pooled=pooled,
+                vehicle_info=vehicle_info,
+                previous_vehicle_info=previous_vehicle_info,
+                customer_info=customer_info,
+                registered_holder_info=registered_holder_info,
+                itemization=itemization,
+                payment_details=payment_details,
+            )
+            for vehicle_info, previous_vehicle_info, customer_info, registered_holder_info, itemization, payment_details
+            in zip(vehicle_infos, previous_vehicle_infos, customer_infos, registered_holder_infos, itemizations, payment_details)
+        ])
+        self._link_sections(orders)
+        return orders
+
+    @transaction.atomic()
+    def copy_order(self, order_id):
+        '''
+        Creates a new order with every value of order_id, extra fields included.
+        Each model is inserted in bulk, so the query count does not grow with the number of extra fields.
+        '''
+        source = get_object_or_404(self._full_orders(), pk=order_id, archived=False)
+        itemization = source.itemization
+        source_sections = [itemization.accessories, itemization.custom_specs, itemization.consumption_tax.extras]
+        sections = self._create(self.custom_section_model, [_copy(section) for section in source_sections])
+        section_ids = {section.pk: copy.pk for section, copy in zip(source_sections, sections)}
+        # Nothing refers to extra fields, so their ids are never needed back
+        self.extra_field_model.objects.bulk_create([
+            _copy(field, section_id=section_ids[field.section_id])
+            for field in self.extra_field_model.objects.filter(section__in=section_ids.keys()).order_by('pk')
+        ])
+        accessories, custom_specs, extras = sections
+        [insurance_tax] = self._create(self.insurance_tax_model, [_copy(itemization.insurance_tax)])
+        [consumption_tax] = self._create(self.consumption_tax_model, [
+            _copy(itemization.consumption_tax, extras_id=extras.pk),
+        ])
+        [tax_exemption] = self._create(self.tax_exemption_model, [_copy(itemization.consumption_tax_exemption)])
+        [itemization] = self._create(self.itemization_model, [_copy(
+            itemization,
+            accessories_id=accessories.pk,
+            custom_specs_id=custom_specs.pk,
+            insurance_tax_id=insurance_tax.pk,
+            consumption_tax_id=consumption_tax.pk,
+            consumption_tax_exemption_id=tax_exemption.pk,
+        )])
+        [vehicle_info] = self._create(self.vehicle_info_model, [_copy(source.vehicle_info)])
+        [previous_vehicle_info] = self._create(self.previous_vehicle_info_model, [_copy(source.previous_vehicle_info)])
+        [customer_info] = self._create(self.customer_info_model, [_copy(source.customer_info)])
+        [registered_holder_info] = self._create(self.registered_holder_info_model, [_copy(source.registered_holder_info)])
+        [payment_details] = self._create(self.payment_details_model, [_copy(source.payment_details)])
+        [order] = self._create(self.order_model, [_copy(
+            source,
             started=timezone.now(),
-            vehicle_info=vehicle_info,
-            previous_vehicle_info=previous_vehicle_info,
-            customer_info=customer_info,
-            registered_holder_info=registered_holder_info,
-            itemization=itemization,
-            payment_details=payment_details,
-        )
+            last_edited=None,
+            completed=None,
+            vehicle_info_id=vehicle_info.pk,
+            previous_vehicle_info_id=previous_vehicle_info.pk,
+            customer_info_id=customer_info.pk,
+            registered_holder_info_id=registered_holder_info.pk,
+            itemization_id=itemization.pk,
+            payment_details_id=payment_details.pk,
+        )])
+        self._link_sections([order])
+        return order
+
+    def refill_order_pool(self, size):
+        '''Tops the pool of blank orders up to size, returning how many were added'''
+        missing = size - self.order_model.objects.filter(pooled=True).count()
+        if missing <= 0:
+            return 0
+        self.initialize_new_orders(missing, pooled=True)
+        return missing
+
+    def claim_pooled_order(self):
+        '''
+        Takes a blank order out of the pool and returns its id, or None when the pool is empty.
+        Concurrent claims never get the same order.
+        '''
+        pooled = self.order_model.objects.filter(pooled=True)
+        claim = {'pooled': False, 'archived': False, 'started': timezone.now()}
+        if connections[pooled.db].features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                order_id = pooled.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+                if order_id is not None:
+                    pooled.filter(pk=order_id).update(**claim)
+                return order_id
+
+        # Without SKIP LOCKED, whichever conditional UPDATE matches first wins and the others retry
+        while True:
+            order_id = pooled.values_list('pk', flat=True).first()
+            if order_id is None or pooled.filter(pk=order_id).update(**claim):
+                return order_id
 
     def initialize_itemization(self):
-        accessories = self.custom_section_model.objects.create()
-        custom_specs = self.custom_section_model.objects.create()
-        insurance_tax = self.insurance_tax_model.objects.create()
-        consumption_tax = self.consumption_tax_model.objects.create(extras=self.custom_section_model.objects.create())
-        consumption_tax_exemption = self.tax_exemption_model.objects.create()
-        return self.itemization_model.objects.create(
-            accessories=accessories,
-            custom_specs=custom_specs,
-            insurance_tax=insurance_tax,
-            consumption_tax=consumption_tax,
-            consumption_tax_exemption=consumption_tax_exemption,
-        )
+        return self.initialize_itemizations(1)[0]
+
+    def initialize_itemizations(self, count):
+        sections = self._create_blank(self.custom_section_model, count * 3)
+        accessories, custom_specs, extras = sections[:count], sections[count:count * 2], sections[count * 2:]
+        insurance_taxes = self._create_blank(self.insurance_tax_model, count)
+        consumption_taxes = self._create(self.consumption_tax_model, [
+            self.consumption_tax_model(extras=section) for section in extras
+        ])
+        consumption_tax_exemptions = self._create_blank(self.tax_exemption_model, count)
+        return self._create(self.itemization_model, [
+            self.itemization_model(
+                accessories=accessories_section,
+                custom_specs=custom_specs_section,
+                insurance_tax=insurance_tax,
+                consumption_tax=consumption_tax,
+                consumption_tax_exemption=consumption_tax_exemption,
+            )
+            for accessories_section, custom_specs_section, insurance_tax, consumption_tax, consumption_tax_exemption
+            in zip(accessories, custom_specs, insurance_taxes, consumption_taxes, consumption_tax_exemptions)
+        ])
+
+    def _link_sections(self, orders):
+        '''Points every CustomSection of orders back at its order, in one UPDATE'''
+        sections = []
+        for order in orders:
+            itemization = order.itemization
+            for section in [itemization.accessories, itemization.custom_specs, itemization.consumption_tax.extras]:
+                section.order = order
+                sections.append(section)
+        self.custom_section_model.objects.bulk_update(sections, ['order'])
+
+    def _create_blank(self, model, count):
+        return self._create(model, [model() for _ in range(count)])
+
+    def _create(self, model, instances):
+        '''
+        Inserts instances with a single bulk INSERT when the database returns the new ids (Postgres).
+        Elsewhere they are inserted one by one, as the ids are needed to link the rest of the graph.
+        '''
+        if connections[model.objects.db].features.can_return_rows_from_bulk_insert:
+            return model.objects.bulk_create(instances)
+        for instance in instances:
+            instance.save(force_insert=True)
+        return instances
 
 
 class ExtrasRespository:
@@ -101,13 +649,110 @@ class ExtrasRespository:
     def get_field_or_404(self, field_id):
         return get_object_or_404(self.extra_field_model, pk=field_id)
 
-    def get_order_from_section(self, section_id):
-        return get_object_or_404(
-            self.order_model,
-            Q(itemization__consumption_tax__extras=section_id)
-            | Q(itemization__accessories=section_id)
-            | Q(itemization__custom_specs=section_id),
-        )
+    def get_order_id_from_section(self, section_id):
+        '''Id of the order owning the section, read from the section row alone'''
+        order_id = self.extra_section_model.objects.filter(pk=section_id).values_list('order_id', flat=True).first()
+        if order_id is None:
+            raise Http404(f'No {self.order_model._meta.object_name} matches the given query.')
+        return order_id
+
+    def get_order_id_from_field(self, field_id):
+        '''Id of the order owning the field, read by one join of the field and section rows'''
+        order_id = self.extra_field_model.objects.filter(pk=field_id).values_list('section__order', flat=True).first()
+        if order_id is None:
+            raise Http404(f'No {self.order_model._meta.object_name} matches the given query.')
+        return order_id
 
     def delete_extra(self, field_id):
-        self.extra_field_model.objects.filter(id=field_id).delete()
+        '''
+        Deletes the field if it exists, bumping its order's revision.
+        Returns the deleted field, with the id of its order as order_id, or None.
+        '''
+        order_id = self.extra_field_model.objects.filter(pk=field_id).values_list('section__order', flat=True).first()
+        if order_id is not None:
+            # Locks the order row before the field is read, as every save of its fields does,
+            # so a save racing this delete cannot leave it reading an old value
+            self.order_model.objects.filter(pk=order_id).update(revision=F('revision') + 1)
+        field = self.extra_field_model.objects.filter(pk=field_id).first()
+        if field is None:
+            return None
+        field.order_id = order_id
+        field.delete()
+        return field
+
+
+class ReportJobRepository:
+    def __init__(self, report_job_model, order_model):
+        self.report_job_model = report_job_model
+        self.order_model = order_model
+        self.statuses = report_job_model.StatusChoices
+
+    def enqueue(self, order_id):
+        '''Queues a render of the order unless one is already waiting or under way'''
+        job = self.report_job_model.objects.filter(
+            order_id=order_id,
+            status__in=[self.statuses.PENDING, self.statuses.RUNNING],
+        ).first()
+        if job is None:
+            job = self.report_job_model.objects.create(order_id=order_id)
+        return job
+
+    def enqueue_idle_orders(self, idle_since, edited_since):
+        '''
+        Queues every order that was completed since edited_since, or last edited between
+        edited_since and idle_since, and has not been queued since.
+        Both are bounded so that orders whose jobs delete_finished has pruned are not queued again.
+        '''
+        jobs = self.report_job_model.objects.filter(order=OuterRef('pk'))
+        orders = self.order_model.objects.filter(archived=False).annotate(
+            queued_since_completed=Exists(jobs.filter(created__gte=OuterRef('completed'))),
+            queued_since_edited=Exists(jobs.filter(created__gte=OuterRef('last_edited'))),
+        ).filter(
+            Q(completed__gte=edited_since, queued_since_completed=False)
+            | Q(last_edited__gte=edited_since, last_edited__lte=idle_since, queued_since_edited=False)
+        )
+        return self.report_job_model.objects.bulk_create([
+            self.report_job_model(order_id=order_id)
+            for order_id in orders.values_list('pk', flat=True)
+        ])
+
+    def claim_next(self):
+        '''
+        Marks the oldest pending job as running and returns it, or None when the queue is empty.
+        The conditional UPDATE makes sure only one worker gets each job.
+        '''
+        pending = self.report_job_model.objects.filter(status=self.statuses.PENDING)
+        while True:
+            job = pending.order_by('created', 'pk').first()
+            if job is None:
+                return None
+            started = timezone.now()
+            if pending.filter(pk=job.pk).update(status=self.statuses.RUNNING, started=started):
+                job.status = self.statuses.RUNNING
+                job.started = started
+                return job
+
+    def requeue_stalled(self, started_before):
+        '''Puts jobs whose worker died mid-render back in the queue'''
+        return self.report_job_model.objects.filter(
+            status=self.statuses.RUNNING,
+            started__lt=started_before,
+        ).update(status=self.statuses.PENDING, started=None)
+
+    def finish(self, job, report_key):
+        job.status = self.statuses.DONE
+        job.finished = timezone.now()
+        job.report_key = report_key
+        job.save(update_fields=['status', 'finished', 'report_key'])
+
+    def fail(self, job, error):
+        job.status = self.statuses.FAILED
+        job.finished = timezone.now()
+        job.error = error
+        job.save(update_fields=['status', 'finished', 'error'])
+
+    def delete_finished(self, before):
+        self.report_job_model.objects.filter(
+            status__in=[self.statuses.DONE, self.statuses.FAILED],
+            finished__lt=before,
+        ).delete()
@@ -42,7 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'hanbai',
+    'hanbai.apps.HanbaiConfig',
 ]
 
 MIDDLEWARE = [
@@ -53,7 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'hanbai.middleware.static_files_middleware',
 
 ]
 
@@ -136,3 +136,28 @@ STATIC_ROOT = BASE_DIR / 'hanbai' / 'static'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 LOGOUT_REDIRECT_URL = '/'
+
+# Rendered PDF cache, see hanbai.report_cache
+# DjangoReportCache takes {'alias': <CACHES key>, 'max_size': ...} instead
+REPORT_CACHE = {
+    'BACKEND': 'hanbai.report_cache.FileSystemReportCache',
+    'OPTIONS': {
+        'location': BASE_DIR / 'report_cache',
+        'max_size': 200 * 1024 * 1024,
+    },
+}
+
+# Render PDFs in `manage.py report_worker` instead of the request thread
+REPORT_RENDER_ASYNC = bool(os.getenv('REPORT_RENDER_ASYNC'))
+
+# Processes rendering PDFs in parallel for bulk_export
+BULK_EXPORT_PROCESSES = int(os.getenv('BULK_EXPORT_PROCESSES', 2))
+
+# Blank orders kept ready for create_new_order, see `manage.py refill_order_pool`
+ORDER_POOL_SIZE = int(os.getenv('ORDER_POOL_SIZE', 5))
+
+# Per-order totals kept in each process, and also in CACHES[ALIAS] when set so processes share them
+TOTALS_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('TOTALS_CACHE_MAX_ENTRIES', 1024)),
+    'ALIAS': os.getenv('TOTALS_CACHE_ALIAS'),
+}
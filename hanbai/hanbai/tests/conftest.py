@@ -0,0 +1,10 @@
+import pytest
+
+from hanbai import api
+
+
+@pytest.fixture
+def order(client, django_user_model):
+    '''A new order, with the client logged in to edit it'''
+    client.force_login(django_user_model.objects.create_user('user'))
+    return api.get_order_repository().initialize_new_order()
@@ -0,0 +1,18 @@
+from datetime import date, datetime
+
+from django.utils import timezone
+import pytest
+
+from hanbai import api
+
+
+@pytest.mark.django_db
+def test_orders_are_summed_by_local_month():
+    repo = api.get_order_repository()
+    order = repo.initialize_new_order()
+    # 2026-08-31 18:00 UTC
+    type(order).objects.filter(pk=order.pk).update(started=timezone.make_aware(datetime(2026, 9, 1, 3)))
+
+    rows = repo.get_sales_summary(['month'], started_from=date(2026, 9, 1), started_to=date(2026, 9, 1))
+    assert [(row['month'], row['orders']) for row in rows] == [(date(2026, 9, 1), 1)]
+    assert repo.get_sales_summary(['month'], started_to=date(2026, 8, 31)) == []
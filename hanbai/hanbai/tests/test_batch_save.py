@@ -0,0 +1,53 @@
+from http import HTTPStatus
+import json
+
+from django.urls import reverse
+import pytest
+
+from hanbai import api
+from hanbai.models import ExtraField, Order
+
+
+def _batch_save(client, order, payload):
+    return client.post(
+        reverse('batch_save', kwargs={'order_id': order.pk}),
+        json.dumps(payload),
+        content_type='application/json',
+    )
+
+
+# The autosave views save on threads of their own, with connections that only see committed rows
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('payload', [
+    [],
+    {'forms': {}},
+    {'forms': [{'instance_id': 1, 'data': {}}]},
+    {'forms': [{'form_class': 'itemization', 'data': {}}]},
+    {'forms': [{'form_class': 'itemization', 'instance_id': 'x', 'data': {}}]},
+    {'forms': [{'form_class': 'itemization', 'instance_id': 1}]},
+    {'extras': [{'section_id': 1, 'data': {}}]},
+    {'extras': [{'data': {'form_prefix': 'p'}}]},
+])
+def test_malformed_payload_is_a_bad_request(client, order, payload):
+    assert _batch_save(client, order, payload).status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rows_of_another_order_are_refused(client, order):
+    other = api.get_order_repository().initialize_new_order()
+    insurance_tax = {'form_class': 'insurance_tax', 'instance_id': other.itemization.insurance_tax_id,
+                     'data': {'weight_tax': '10000'}}
+    new_extra = {'section_id': other.itemization.accessories_id,
+                 'data': {'form_prefix': 'p', 'p-field_name': 'x', 'p-type_agnostic_value': '10000'}}
+
+    assert _batch_save(client, order, {'forms': [insurance_tax]}).status_code == HTTPStatus.NOT_FOUND
+    assert _batch_save(client, order, {'extras': [new_extra]}).status_code == HTTPStatus.NOT_FOUND
+    response = client.post(
+        reverse('set_form_generic', kwargs={
+            'order_id': order.pk, 'form_class': 'insurance_tax', 'instance_id': other.itemization.insurance_tax_id}),
+        {'weight_tax': '10000'},
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    for saved in Order.objects.filter(pk__in=[order.pk, other.pk]):
+        assert saved.final_total == 0
+    assert ExtraField.objects.count() == 0
@@ -0,0 +1,19 @@
+from http import HTTPStatus
+
+from django.urls import reverse
+import pytest
+
+from hanbai import api
+from hanbai import views
+
+
+@pytest.mark.django_db
+def test_single_pdf_is_refused_above_the_cap(client, django_user_model, monkeypatch):
+    client.force_login(django_user_model.objects.create_user('user'))
+    monkeypatch.setattr(views, 'BULK_EXPORT_PDF_MAX_ORDERS', 1)
+    repo = api.get_order_repository()
+    ids = [repo.initialize_new_order().pk for _ in range(2)]
+
+    response = client.get(reverse('bulk_export'), {'ids': ','.join(map(str, ids)), 'format': 'pdf'})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'format' in response.json()
@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import pytest
+
+from hanbai import api
+from hanbai.repositories import encode_cursor
+
+
+def _query_plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # An empty table is cheaper to scan than any index, so scans are ruled out
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(str(row) for row in cursor.fetchall())
+
+
+def _plan_of_last_query(call):
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    return _query_plan(queries[-1]['sql'])
+
+
+@pytest.mark.django_db
+def test_order_list_page_uses_order_list_idx():
+    repo = api.get_order_repository()
+    assert 'order_list_idx' in _plan_of_last_query(repo.get_order_list_page)
+
+
+@pytest.mark.django_db
+def test_order_list_cursor_page_seeks_order_list_idx():
+    repo = api.get_order_repository()
+    cursor = encode_cursor(timezone.now(), 1)
+    plan = _plan_of_last_query(lambda: repo.get_order_list_page(cursor))
+    assert 'order_list_idx' in plan
+    # Seeking straight to the cursor, rather than reading the index from the top and filtering
+    assert ('Index Cond' if connection.vendor == 'postgresql' else 'SEARCH') in plan
+
+
+@pytest.mark.django_db
+def test_in_progress_order_uses_order_in_progress_idx():
+    repo = api.get_order_repository()
+    assert 'order_in_progress_idx' in _plan_of_last_query(repo.get_in_progress_order)
+
+
+@pytest.mark.django_db
+def test_started_range_uses_order_started_idx():
+    repo = api.get_order_repository()
+    plan = _plan_of_last_query(lambda: repo.get_order_ids(started_from=date(2026, 9, 1), started_to=date(2026, 9, 30)))
+    assert 'order_started_idx' in plan
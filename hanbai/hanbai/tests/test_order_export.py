@@ -0,0 +1,15 @@
+import pytest
+
+from hanbai import api
+from hanbai.repositories import EXPORT_EXCLUDED_COLUMNS
+
+
+@pytest.mark.django_db
+def test_export_records_leave_out_bookkeeping_columns():
+    repo = api.get_order_repository()
+    repo.initialize_new_order()
+    [record] = repo.iter_export_records()
+    for section, values in record.items():
+        if isinstance(values, dict):
+            assert not EXPORT_EXCLUDED_COLUMNS & set(values), section
+    assert {'id', 'started', 'notes', 'final_total'} <= set(record['order'])
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.utils import timezone
+import pytest
+
+from hanbai import api
+from hanbai.models import Order
+
+
+@pytest.mark.django_db
+def test_order_list_pages_cover_ties_and_never_edited_orders_once():
+    repo = api.get_order_repository()
+    now = timezone.now()
+    # Two never edited, three edited at the same moment, two edited before
+    last_edited = [None, None, now, now, now, now - timedelta(days=1), now - timedelta(days=1)]
+    for edited in last_edited:
+        Order.objects.filter(pk=repo.initialize_new_order().pk).update(last_edited=edited)
+    expected = [
+        order.pk for order in sorted(
+            Order.objects.all(),
+            key=lambda order: (order.last_edited is not None, -(order.last_edited or now).timestamp(), -order.pk),
+        )
+    ]
+
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = repo.get_order_list_page(cursor, page_size=2)
+        pages.append([row['id'] for row in rows])
+        if cursor is None:
+            break
+    assert sum(pages, []) == expected
+    assert len(pages) == 4
@@ -0,0 +1,31 @@
+from django.urls import reverse
+import pytest
+
+from hanbai import api
+from hanbai.models import Order
+
+
+# The autosave views save on threads of their own, with connections that only see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_order_form_save_keeps_revision_and_totals(client, order):
+    itemization = order.itemization
+    client.post(
+        reverse('set_form_generic', kwargs={'order_id': order.pk, 'form_class': 'itemization', 'instance_id': itemization.pk}),
+        {'vehicle_price': '1000'},
+    )
+    client.post(
+        reverse('set_form_generic', kwargs={'order_id': order.pk, 'form_class': 'order', 'instance_id': order.pk}),
+        {'notes': 'memo'},
+    )
+    saved = Order.objects.get(pk=order.pk)
+    assert saved.notes == 'memo'
+    assert saved.revision == 2
+    assert saved.subtotal == 1000
+
+
+@pytest.mark.django_db
+def test_delete_order_keeps_stored_totals(order):
+    Order.objects.filter(pk=order.pk).update(final_total=1234, revision=5)
+    api.get_order_repository().delete_order(order.pk)
+    saved = Order.objects.get(pk=order.pk)
+    assert (saved.archived, saved.final_total, saved.revision) == (True, 1234, 5)
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+
+from hanbai import api
+from hanbai.checks import check_report_cache
+from hanbai.models import ReportJob
+from hanbai.report_cache import report_key
+
+
+@pytest.mark.django_db
+def test_completed_orders_are_queued_once_within_the_lookback():
+    order_repo = api.get_order_repository()
+    job_repo = api.get_report_job_repository()
+    now = timezone.now()
+    recent = order_repo.initialize_new_order()
+    old = order_repo.initialize_new_order()
+    type(recent).objects.filter(pk=recent.pk).update(completed=now - timedelta(hours=1))
+    type(old).objects.filter(pk=old.pk).update(completed=now - timedelta(days=30))
+
+    # old stands for an order whose job delete_finished has pruned
+    queued = job_repo.enqueue_idle_orders(idle_since=now, edited_since=now - timedelta(days=1))
+    assert [job.order_id for job in queued] == [recent.pk]
+    assert job_repo.enqueue_idle_orders(idle_since=now, edited_since=now - timedelta(days=1)) == []
+
+
+@pytest.mark.django_db
+def test_renders_under_way_are_not_queued_again():
+    order = api.get_order_repository().initialize_new_order()
+    job_repo = api.get_report_job_repository()
+    job = job_repo.enqueue(order.pk)
+    assert job_repo.claim_next() == job
+    assert job_repo.enqueue(order.pk) == job
+
+
+@pytest.mark.django_db
+def test_finished_render_missing_from_the_cache_is_a_failure(client, order, settings, tmp_path):
+    settings.REPORT_CACHE = {
+        'BACKEND': 'hanbai.report_cache.FileSystemReportCache',
+        'OPTIONS': {'location': tmp_path, 'max_size': 1024},
+    }
+    order_repo = api.get_order_repository()
+    job_repo = api.get_report_job_repository()
+    url = reverse('report_status', kwargs={'order_id': order.pk})
+    # Rendered into a cache this process cannot read
+    job_repo.finish(job_repo.enqueue(order.pk), report_key(order_repo.get_full_order_or_404(order.pk)))
+    assert client.get(url).json() == {'ready': False, 'failed': True}
+
+    # Rendered before the order was edited again
+    ReportJob.objects.update(report_key='0' * 64)
+    assert client.get(url).json() == {'ready': False, 'failed': False}
+    assert job_repo.claim_next().order_id == order.pk
+
+
+@pytest.mark.parametrize('cache_backend, errors', [
+    ('django.core.cache.backends.locmem.LocMemCache', ['hanbai.E001']),
+    ('django.core.cache.backends.db.DatabaseCache', []),
+])
+def test_async_rendering_needs_a_shared_report_cache(settings, cache_backend, errors):
+    settings.REPORT_RENDER_ASYNC = True
+    settings.CACHES = {**settings.CACHES, 'reports': {'BACKEND': cache_backend, 'LOCATION': 'reports'}}
+    settings.REPORT_CACHE = {
+        'BACKEND': 'hanbai.report_cache.DjangoReportCache',
+        'OPTIONS': {'alias': 'reports', 'max_size': 1024},
+    }
+    assert [error.id for error in check_report_cache(None)] == errors
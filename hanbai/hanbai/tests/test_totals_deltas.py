@@ -0,0 +1,88 @@
+import json
+import random
+
+from django.urls import reverse
+import pytest
+
+from hanbai import api
+from hanbai.models import ExtraField, Order
+
+
+def _amount(rng):
+    # Blank, zero, a figure, or invalid input that must leave the totals as they were
+    return rng.choice(['', '0', str(rng.randint(1, 99999)), 'abc'])
+
+
+def _save_form(client, order, form_class, instance_id, data):
+    return client.post(
+        reverse('set_form_generic', kwargs={'order_id': order.pk, 'form_class': form_class, 'instance_id': instance_id}),
+        data,
+    )
+
+
+def _extra_data(rng):
+    return {'form_prefix': 'p', 'p-field_name': 'x', 'p-type_agnostic_value': _amount(rng)}
+
+
+def _random_save(client, order, rng):
+    itemization = order.itemization
+    sections = [itemization.accessories_id, itemization.custom_specs_id, itemization.consumption_tax.extras_id]
+    fields = list(ExtraField.objects.values_list('pk', flat=True))
+    step = rng.randrange(7 if fields else 5)
+    if step == 0:
+        return _save_form(client, order, 'itemization', itemization.pk, {
+            'vehicle_price': _amount(rng), 'special_discount': _amount(rng), 'trade_in_price': _amount(rng)})
+    if step == 1:
+        return _save_form(client, order, 'insurance_tax', itemization.insurance_tax_id, {
+            'weight_tax': _amount(rng), 'stamp_duty': _amount(rng)})
+    if step == 2:
+        return _save_form(client, order, 'consumption_tax', itemization.consumption_tax_id, {
+            'delivery_fee': _amount(rng), 'audit_fee': _amount(rng)})
+    if step == 3:
+        return _save_form(client, order, 'tax_exemption', itemization.consumption_tax_exemption_id, {
+            'recycle_deposit': _amount(rng)})
+    if step == 4:
+        return client.post(
+            reverse('process_new_extras_form', kwargs={'section_id': rng.choice(sections)}), _extra_data(rng))
+    if step == 5:
+        return client.post(
+            reverse('process_existing_extras_form', kwargs={'instance_id': rng.choice(fields)}), _extra_data(rng))
+    return client.delete(reverse('delete_extras', kwargs={'instance_id': rng.choice(fields)}))
+
+
+def _assert_stored_totals_are_recomputed_ones(order):
+    repo = api.get_order_repository()
+    assert repo.get_stored_totals([order.pk]) == repo.get_order_totals([order.pk])
+
+
+# The autosave views save on threads of their own, with connections that only see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_stored_totals_follow_every_kind_of_save(client, order):
+    rng = random.Random(1)
+    for _ in range(100):
+        _random_save(client, order, rng)
+        _assert_stored_totals_are_recomputed_ones(order)
+    assert Order.objects.get(pk=order.pk).final_total
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stored_totals_follow_batch_saves(client, order):
+    itemization = order.itemization
+    field = ExtraField.objects.create(section_id=itemization.accessories_id, field_name='x', value_type=2, integer_value=10)
+    api.get_order_repository().refresh_totals(order.pk)
+    payload = {
+        'forms': [
+            {'form_class': 'itemization', 'instance_id': itemization.pk, 'data': {'vehicle_price': '5000'}},
+            {'form_class': 'insurance_tax', 'instance_id': itemization.insurance_tax_id, 'data': {'weight_tax': '300'}},
+        ],
+        'extras': [
+            {'instance_id': field.pk, 'data': {'form_prefix': 'a', 'a-field_name': 'x', 'a-type_agnostic_value': '70'}},
+            {'section_id': itemization.custom_specs_id,
+             'data': {'form_prefix': 'b', 'b-field_name': 'y', 'b-type_agnostic_value': '20'}},
+        ],
+    }
+    response = client.post(
+        reverse('batch_save', kwargs={'order_id': order.pk}), json.dumps(payload), content_type='application/json')
+    assert response.status_code == 200
+    _assert_stored_totals_are_recomputed_ones(order)
+    assert Order.objects.get(pk=order.pk).final_total
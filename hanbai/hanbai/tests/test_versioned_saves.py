@@ -0,0 +1,91 @@
+from http import HTTPStatus
+import json
+
+from django.http import QueryDict
+from django.urls import reverse
+import pytest
+
+from hanbai import forms
+from hanbai.models import InsuranceTax, Itemization, Order, VersionConflict
+from hanbai.views import _save_generic_form
+
+
+def _save_itemization(client, order, data):
+    return client.post(
+        reverse('set_form_generic', kwargs={
+            'order_id': order.pk, 'form_class': 'itemization', 'instance_id': order.itemization_id}),
+        data,
+    )
+
+
+@pytest.mark.django_db
+def test_save_changes_writes_only_the_named_fields(order):
+    # apply_totals_delta moves the totals without bumping the version
+    Order.objects.filter(pk=order.pk).update(final_total=1234)
+    order.notes = 'memo'
+    order.save_changes(['notes'])
+    saved = Order.objects.get(pk=order.pk)
+    assert (saved.notes, saved.final_total, saved.version) == ('memo', 1234, 1)
+    assert order.version == 1
+
+
+@pytest.mark.django_db
+def test_save_changes_based_on_an_older_version_writes_nothing(order):
+    itemization = Itemization.objects.get(pk=order.itemization_id)
+    itemization.vehicle_price = 1000
+    itemization.save_changes(['vehicle_price'])
+    itemization.vehicle_price = 2000
+    with pytest.raises(VersionConflict):
+        itemization.save_changes(['vehicle_price'], version=0)
+    saved = Itemization.objects.get(pk=order.itemization_id)
+    assert (saved.vehicle_price, saved.version) == (1000, 1)
+
+
+@pytest.mark.django_db
+def test_form_save_writes_only_the_fields_it_changed(order):
+    instance = Order.objects.get(pk=order.pk)
+    # Moved after the form's row was read, as apply_totals_delta does
+    Order.objects.filter(pk=order.pk).update(final_total=1234)
+    errors, _ = _save_generic_form(forms.OrderForm, instance, QueryDict('notes=memo'))
+    assert errors is None
+    saved = Order.objects.get(pk=order.pk)
+    assert (saved.notes, saved.final_total) == ('memo', 1234)
+
+
+# The autosave views save on threads of their own, with connections that only see committed rows
+@pytest.mark.django_db(transaction=True)
+def test_conflicting_save_is_answered_with_the_current_row(client, order):
+    assert _save_itemization(client, order, {'vehicle_price': '1000', 'version': '0'}).status_code == HTTPStatus.OK
+
+    response = _save_itemization(client, order, {'special_discount': '100', 'version': '0'})
+    assert response.status_code == HTTPStatus.CONFLICT
+    body = response.json()
+    assert body['version'] == 1
+    assert body['data']['vehicle_price'] == '1000'
+    assert body['data']['special_discount'] is None
+    saved = Itemization.objects.get(pk=order.itemization_id)
+    assert (saved.vehicle_price, saved.special_discount, saved.version) == (1000, None, 1)
+    assert Order.objects.get(pk=order.pk).subtotal == 1000
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_with_one_conflicting_form_saves_nothing(client, order):
+    assert _save_itemization(client, order, {'vehicle_price': '1000', 'version': '0'}).status_code == HTTPStatus.OK
+    autosave_seq = Order.objects.get(pk=order.pk).autosave_seq
+    itemization = order.itemization
+    payload = {'autosave_seq': autosave_seq + 1, 'forms': [
+        {'form_class': 'insurance_tax', 'instance_id': itemization.insurance_tax_id, 'version': 0,
+         'data': {'weight_tax': '300'}},
+        {'form_class': 'itemization', 'instance_id': itemization.pk, 'version': 0,
+         'data': {'special_discount': '100'}},
+    ]}
+    response = client.post(
+        reverse('batch_save', kwargs={'order_id': order.pk}), json.dumps(payload), content_type='application/json')
+    assert response.status_code == HTTPStatus.CONFLICT
+    conflicts = response.json()['conflicts']
+    assert list(conflicts) == ['forms-1']
+    assert conflicts['forms-1']['version'] == 1
+    insurance_tax = InsuranceTax.objects.get(pk=itemization.insurance_tax_id)
+    assert (insurance_tax.weight_tax, insurance_tax.version) == (None, 0)
+    saved = Order.objects.get(pk=order.pk)
+    assert (saved.subtotal, saved.autosave_seq) == (1000, autosave_seq)
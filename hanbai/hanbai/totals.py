@@ -0,0 +1,124 @@
+from dataclasses import dataclass, asdict, fields
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class OrderTotals:
+    '''
+    Every computed line of the order sheet, worked out once from a single snapshot.
+    Number comments correspond to numbers on original sheet
+    '''
+    subtotal: Optional[int]  # 4
+    accessories_total: Optional[int]  # 5
+    custom_specs_total: Optional[int]  # 6
+    total_sale_price: int  # 9
+    insurance_tax_total: Optional[int]  # 10
+    consumption_tax_total: Optional[int]  # 11
+    tax_exemption_total: Optional[int]  # 12
+    all_tax_total: int  # 13
+    taxable_total: int  # 9 + 10 + 11
+    all_total: int  # 14
+    trade_in_price: Optional[int]  # 16
+    final_total: int
+
+    @classmethod
+    def calculate(cls,
+                  vehicle_price=None,
+                  special_discount=None,
+                  accessories=0,
+                  custom_specs=0,
+                  insurance_tax=0,
+                  consumption_tax=0,
+                  tax_exemption=0,
+                  trade_in_price=None):
+        '''
+        Builds every line from the raw inputs of the sheet.
+        Section arguments are the already summed totals of each section.
+        Every line is a plain sum of these inputs, which is what lets apply_delta work.
+        '''
+        subtotal = ((vehicle_price or 0) - (special_discount or 0)) or None
+        accessories_total = accessories or None
+        custom_specs_total = custom_specs or None
+        total_sale_price = (subtotal or 0) + (accessories_total or 0) + (custom_specs_total or 0)
+        insurance_tax_total = insurance_tax or None
+        consumption_tax_total = consumption_tax or None
+        tax_exemption_total = tax_exemption or None
+        taxable_total = total_sale_price + (insurance_tax_total or 0) + (consumption_tax_total or 0)
+        all_total = sum(filter(None, [taxable_total, tax_exemption_total]))
+        # TODO:: 13 should be (9 + 11 - 16). What is 16?
+        all_tax_total = all_total
+        final_total = sum(filter(None, [total_sale_price, taxable_total, all_tax_total])) - (trade_in_price or 0)
+        return cls(
+            subtotal=subtotal,
+            accessories_total=accessories_total,
+            custom_specs_total=custom_specs_total,
+            total_sale_price=total_sale_price,
+            insurance_tax_total=insurance_tax_total,
+            consumption_tax_total=consumption_tax_total,
+            tax_exemption_total=tax_exemption_total,
+            all_tax_total=all_tax_total,
+            taxable_total=taxable_total,
+            all_total=all_total,
+            trade_in_price=trade_in_price or None,
+            final_total=final_total,
+        )
+
+    @classmethod
+    def from_itemization(cls, itemization, aggregates):
+        '''
+        aggregates maps CustomSection ids to their integer totals,
+        as returned by ExtraField.objects.integer_aggregates
+        '''
+        consumption_tax = itemization.consumption_tax
+        return cls.calculate(
+            vehicle_price=itemization.vehicle_price,
+            special_discount=itemization.special_discount,
+            accessories=aggregates[itemization.accessories_id],
+            custom_specs=aggregates[itemization.custom_specs_id],
+            insurance_tax=itemization.insurance_tax.total,
+            consumption_tax=consumption_tax.fields_total + aggregates[consumption_tax.extras_id],
+            tax_exemption=itemization.consumption_tax_exemption.total,
+            trade_in_price=itemization.trade_in_price,
+        )
+
+    def inputs(self):
+        '''calculate() arguments that give back these totals'''
+        return {
+            # Only the difference of 1 and 2 is ever used
+            'vehicle_price': self.subtotal or 0,
+            'special_discount': 0,
+            'accessories': self.accessories_total or 0,
+            'custom_specs': self.custom_specs_total or 0,
+            'insurance_tax': self.insurance_tax_total or 0,
+            'consumption_tax': self.consumption_tax_total or 0,
+            'tax_exemption': self.tax_exemption_total or 0,
+            'trade_in_price': self.trade_in_price or 0,
+        }
+
+    def apply_delta(self, deltas):
+        '''
+        These totals after the calculate() inputs named in deltas moved by the given amounts,
+        as found by totals_delta. No section has to be summed again.
+        '''
+        inputs = self.inputs()
+        for name, delta in deltas.items():
+            inputs[name] += delta
+        return self.calculate(**inputs)
+
+    def json(self):
+        return {k: v or 0 for k, v in asdict(self).items()}
+
+
+def totals_delta(before, after):
+    '''
+    How far each calculate() input moved between two totals_inputs() results of the same model instance.
+    Inputs that did not move are left out.
+    '''
+    return {
+        name: after.get(name, 0) - before.get(name, 0)
+        for name in before.keys() | after.keys()
+        if after.get(name, 0) != before.get(name, 0)
+    }
+
+# Names of every OrderTotals line, which Order also stores as columns
+TOTALS_FIELDS = tuple(field.name for field in fields(OrderTotals))
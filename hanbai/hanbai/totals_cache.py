@@ -0,0 +1,49 @@
+from collections import OrderedDict
+import threading
+
+from django.core.cache import caches
+
+
+class TotalsCache:
+    '''
+    OrderTotals keyed by order id and Order.revision. Every change bumps the revision,
+    so entries never need invalidating: stale ones are simply never asked for again.
+    Entries live in an in-process LRU of max_entries, and also in settings.CACHES[alias]
+    when one is given, so other processes can reuse them.
+    '''
+    def __init__(self, max_entries, alias=None, timeout=24 * 60 * 60):
+        self.max_entries = max_entries
+        self.shared = caches[alias] if alias else None
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _key(self, order_id, revision):
+        return f'hanbai-totals:{order_id}:{revision}'
+
+    def get(self, order_id, revision):
+        key = self._key(order_id, revision)
+        with self.lock:
+            totals = self.entries.get(key)
+            if totals is not None:
+                self.entries.move_to_end(key)
+                return totals
+        if self.shared is None:
+            return None
+        totals = self.shared.get(key)
+        if totals is not None:
+            self._remember(key, totals)
+        return totals
+
+    def set(self, order_id, revision, totals):
+        key = self._key(order_id, revision)
+        self._remember(key, totals)
+        if self.shared is not None:
+            self.shared.set(key, totals, self.timeout)
+
+    def _remember(self, key, totals):
+        with self.lock:
+            self.entries[key] = totals
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
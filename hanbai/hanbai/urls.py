@@ -27,11 +27,20 @@ urlpatterns = [
     path('', views.top, name='top'),
     path('create_new_order/', views.create_new_order, name='create_new_order'),
     path('edit/<int:order_id>/', views.edit_order, name='edit_order'),
+    path('copy/<int:order_id>/', views.copy_order, name='copy_order'),
     path('order_list/', views.order_list, name='order_list'),
+    path('order_list/page/', views.order_list_page, name='order_list_page'),
     path('set_form_generic/<int:order_id>/<str:form_class>/<int:instance_id>', views.set_form_generic, name='set_form_generic'),
+    path('batch_save/<int:order_id>', views.batch_save, name='batch_save'),
     path('process_new_extras_form/<int:section_id>', views.process_new_extras_form, name='process_new_extras_form'),
     path('process_extras_form/<int:instance_id>', views.process_existing_extras_form, name='process_existing_extras_form'),
     path('delete_extras/<int:instance_id>', views.delete_extra_field, name='delete_extras'),
     path('download/<int:order_id>', views.download_report, name='download_report'),
+    path('bulk_export/', views.bulk_export, name='bulk_export'),
+    path('export_orders/', views.export_orders, name='export_orders'),
+    path('report_status/<int:order_id>', views.report_status, name='report_status'),
+    path('analytics/', views.analytics, name='analytics'),
+    path('analytics/data/', views.analytics_data, name='analytics_data'),
+    path('order/<int:order_id>', views.get_order, name='get_order'),
     path('delete/<int:order_id>', views.delete_order, name='delete_order'),
 ]
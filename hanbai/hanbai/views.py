@@ -1,16 +1,30 @@
+from collections import Counter
 from http import HTTPStatus
+from io import BytesIO
+import json
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, Http404, FileResponse
+from django.template.loader import render_to_string
+from django.http import JsonResponse, Http404, FileResponse, QueryDict, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils import timezone
 
 from . import api
+from . import exports
 from . import forms
+from .decorators import async_login_required, async_require_http_methods, database_sync_to_async
+from .report_cache import report_key
 from .reports import OrderReport
-from .constants import FORM_MAPPING
+from .models import VersionConflict
+from .repositories import StaleAutosave
+from .totals import totals_delta
+from .constants import BULK_EXPORT_PDF_MAX_ORDERS, FORM_MAPPING, ORDER_EXPORT_CHUNK_SIZE, ORDER_LIST_PAGE_SIZE
 
 
 @login_required
@@ -27,26 +41,31 @@ def top(request):
 @login_required
 def edit_order(request, order_id):
     repo = api.get_order_repository()
-    order = repo.get_order_or_404(order_id)
+    order = repo.get_full_order_or_404(order_id)
     # TODO:: A single form for "extra section"s that handles the input type etc.
+    # Fields were loaded with the order; len() of these lists replaces COUNT queries
+    consumption_tax_extras = order.itemization.consumption_tax.extras.fields.all()
+    accessories = order.itemization.accessories.fields.all()
+    custom_specs = order.itemization.custom_specs.fields.all()
     consumption_tax_extras_form = forms.CustomFieldsFormSet.build_formset(
         order.itemization.consumption_tax.extras,
-        order.itemization.consumption_tax.extras.fields.all(),
+        consumption_tax_extras,
         extra=1,
     )
     accessories_form = forms.CustomFieldsFormSet.build_formset(
         order.itemization.accessories,
-        order.itemization.accessories.fields.all(),
-        extra=max(1, 10 - order.itemization.accessories.fields.count()),
+        accessories,
+        extra=max(1, 10 - len(accessories)),
     )
     custom_specs_form = forms.CustomFieldsFormSet.build_formset(
         order.itemization.custom_specs,
-        order.itemization.custom_specs.fields.all(),
-        extra=max(1, 5 - order.itemization.custom_specs.fields.count()),
+        custom_specs,
+        extra=max(1, 5 - len(custom_specs)),
     )
 
     ctx = {
         'order': order.json(),
+        'autosave_seq': order.autosave_seq,
         'order_form': forms.OrderForm(instance=order),
         'vehicle_info_form': forms.VehicleInfoForm(instance=order.vehicle_info),
         'previous_vehicle_form': forms.PreviousVehicleInfoForm(instance=order.previous_vehicle_info, prefix='previous'),
@@ -66,110 +85,503 @@ def edit_order(request, order_id):
 @login_required
 def create_new_order(request):
     repo = api.get_order_repository()
-    order = repo.initialize_new_order()
+    order_id = repo.claim_pooled_order()
+    if order_id is None:
+        order_id = repo.initialize_new_order().pk
+    return redirect('edit_order', order_id=order_id)
+
+
+@login_required
+def copy_order(request, order_id):
+    repo = api.get_order_repository()
+    order = repo.copy_order(order_id)
     return redirect('edit_order', order_id=order.pk)
 
 
 @login_required
 def order_list(request):
     repo = api.get_order_repository()
-    orders = repo.get_all_orders()
-    return render(request, 'order_list.html', {'orders': orders})
+    orders, next_cursor = repo.get_order_list_page(page_size=ORDER_LIST_PAGE_SIZE)
+    return render(request, 'order_list.html', {
+        'orders': orders,
+        'next_cursor': next_cursor,
+        'bulk_export_form': forms.BulkExportForm(),
+        'order_export_form': forms.OrderExportForm(),
+    })
 
 
 @login_required
-@require_http_methods(['POST'])
-def set_form_generic(request, form_class, instance_id, order_id):
+@require_http_methods(['GET'])
+def order_list_page(request):
+    repo = api.get_order_repository()
+    try:
+        orders, next_cursor = repo.get_order_list_page(request.GET.get('cursor'), page_size=ORDER_LIST_PAGE_SIZE)
+    except ValueError as e:
+        return JsonResponse({'cursor': [str(e)]}, status=HTTPStatus.BAD_REQUEST)
+    rows = render_to_string('order_list_rows.html', {'orders': orders}, request=request)
+    return JsonResponse({'rows': rows, 'next_cursor': next_cursor})
+
+
+def _get_form_instance(order, form_class, instance_id):
+    '''The form class and the instance it edits, which must belong to the given OrderHandle'''
     form = FORM_MAPPING.get(form_class)
     if not form:
         raise Http404('フォーム種類は存在しません。')
     instance = get_object_or_404(form._meta.model, pk=instance_id)
+    _check_owned(order, instance)
+    return form, instance
+
+
+def _check_owned(order, instance):
+    # Saving another order's row would move this order's stored totals and leave that one's stale
+    if not order.owns(instance):
+        raise Http404('この注文書のフォームではありません。')
+
+
+def _save_generic_form(form, instance, data, prefix=None, version=None):
+    '''
+    Saves the fields of one section form that differ from the row, returning (errors, totals deltas).
+    The deltas say how far the save moved each OrderTotals.calculate input.
+    version is the one the client's values are based on; VersionConflict is raised
+    if the row has been saved since.
+    '''
+    # Validation writes the new values onto instance, so the old ones are read first
+    before = _totals_inputs(instance)
+    form = form(data, instance=instance, prefix=prefix)
+    if not form.is_valid():
+        return form.errors, None
+    if form.changed_data:
+        instance.save_changes(form.changed_data, version)
+    return None, totals_delta(before, _totals_inputs(instance))
+
+
+def _current_state(form, instance, prefix=None):
+    '''What a conflicting save is answered with: the row's version and values, keyed by input name'''
+    instance.refresh_from_db()
+    form = form(instance=instance, prefix=prefix)
+    data = {}
+    for field in form:
+        data.update(_input_values(field))
+    return {'version': instance.version, 'data': data}
+
+
+def _input_values(field):
+    '''A bound field's values as its inputs hold them, keyed by input name, for the client to compare with its own'''
+    widget = field.field.widget.get_context(field.html_name, field.value(), {})['widget']
+    values = {}
+    # Widgets such as SelectDateWidget render several inputs
+    for subwidget in widget.get('subwidgets') or [widget]:
+        value = subwidget['value']
+        if isinstance(value, list):
+            # Selects hold a list of the selected values
+            value = value[0] if value else None
+        values[subwidget['name']] = value
+    return values
+
+
+def _totals_inputs(instance):
+    # Only the models feeding OrderTotals define totals_inputs
+    return instance.totals_inputs() if hasattr(instance, 'totals_inputs') else {}
+
+
+def _save_extras_form(data, section, instance=None):
+    '''
+    Saves one extra field form, returning (errors, created field, totals delta).
+    The created field is None unless the save added a new one.
+    The delta is how far the save moved the section's total.
+    '''
+    before = instance.totals_contribution if instance is not None else 0
+    form_data = data.copy()
+    prefix = form_data.pop('form_prefix')[0]
+    form_data[f'{prefix}-section'] = section
+    form = forms.CustomFieldForm(form_data, instance=instance, section=section, prefix=prefix)
+    if not form.is_valid():
+        return form.errors, None, 0
+    if instance is None and not (form.cleaned_data['field_name'] or form.cleaned_data['type_agnostic_value']):
+        # Blank new rows are not worth saving
+        return None, None, 0
+    form.save()
+    delta = form.instance.totals_contribution - before
+    return None, form.instance if instance is None else None, delta
+
+
+def _optional_int(value):
+    '''A number the client may send with a save, such as autosave_seq or version, or None'''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stale_autosave_response(stale):
+    # Nothing was saved; the client numbers its next save after the one applied
+    return JsonResponse({'stale': True, 'autosave_seq': stale.autosave_seq})
+
+
+# The autosave views are async so one ASGI worker can hold many connections and save for many at once.
+# Django's ORM is synchronous before 4.1 and a transaction cannot span awaits,
+# so each of them hands its whole save to one call on a thread of its own.
+@async_login_required
+@async_require_http_methods(['POST'])
+async def set_form_generic(request, form_class, instance_id, order_id):
+    return await database_sync_to_async(_set_form_generic)(request, form_class, instance_id, order_id)
+
+
+def _set_form_generic(request, form_class, instance_id, order_id):
     repo = api.get_order_repository()
-    order = repo.set_last_edited(order_id)
-    form = form(request.POST, instance=instance)
-    if form.is_valid():
-        form.save()
-    else:
-        return JsonResponse(form.errors, status=HTTPStatus.BAD_REQUEST)
-    return JsonResponse({'order': order.json()})
+    with transaction.atomic():
+        try:
+            order = repo.set_last_edited(order_id, _optional_int(request.POST.get('autosave_seq')))
+        except StaleAutosave as e:
+            return _stale_autosave_response(e)
+        # Read under the order's row lock, so the totals delta starts from the stored values
+        form, instance = _get_form_instance(order, form_class, instance_id)
+        try:
+            errors, deltas = _save_generic_form(
+                form, instance, request.POST, version=_optional_int(request.POST.get('version')))
+        except VersionConflict:
+            state = _current_state(form, instance)
+            transaction.set_rollback(True)
+            return JsonResponse(state, status=HTTPStatus.CONFLICT)
+        if errors:
+            return JsonResponse(errors, status=HTTPStatus.BAD_REQUEST)
+        order.apply_totals_delta(deltas)
+    return JsonResponse({'order': order.json(), 'version': instance.version})
 
 
-@login_required
-@require_http_methods(['POST'])
-def process_existing_extras_form(request, instance_id):
+@async_login_required
+@async_require_http_methods(['POST'])
+async def process_existing_extras_form(request, instance_id):
+    return await database_sync_to_async(_process_existing_extras_form)(request, instance_id)
+
+
+def _process_existing_extras_form(request, instance_id):
     repo = api.get_extras_repo()
     order_repo = api.get_order_repository()
-    existing_field = repo.get_field_or_404(instance_id)
-    order = repo.get_order_from_section(existing_field.section)
-    order_repo.set_last_edited(order.id)
-    form_data = request.POST.copy()
-    prefix = form_data.pop('form_prefix')[0]
-    form_data[f'{prefix}-section'] = existing_field.section
-    form = forms.CustomFieldForm(
-        form_data,
-        instance=existing_field,
-        section=existing_field.section,
-        prefix=prefix,
-    )
-    if form.is_valid():
-        form.save()
-    else:
-        return JsonResponse(form.errors, status=HTTPStatus.BAD_REQUEST)
+    with transaction.atomic():
+        try:
+            order = order_repo.set_last_edited(
+                repo.get_order_id_from_field(instance_id),
+                _optional_int(request.POST.get('autosave_seq')),
+            )
+        except StaleAutosave as e:
+            return _stale_autosave_response(e)
+        # Every save of an extra field locks its order row first, so this reads the field's stored value
+        existing_field = repo.get_field_or_404(instance_id)
+        errors, _, delta = _save_extras_form(request.POST, existing_field.section, instance=existing_field)
+        if errors:
+            return JsonResponse(errors, status=HTTPStatus.BAD_REQUEST)
+        order.apply_totals_delta({}, {existing_field.section_id: delta})
     return JsonResponse({'order': order.json()})
 
 
-@login_required
-@require_http_methods(['POST'])
-def process_new_extras_form(request, section_id):
+@async_login_required
+@async_require_http_methods(['POST'])
+async def process_new_extras_form(request, section_id):
+    return await database_sync_to_async(_process_new_extras_form)(request, section_id)
+
+
+def _process_new_extras_form(request, section_id):
     repo = api.get_extras_repo()
     order_repo = api.get_order_repository()
-    order = repo.get_order_from_section(section_id)
-    order_repo.set_last_edited(order.id)
-    section = repo.get_section_or_404(section_id)
-    form_data = request.POST.copy()
-    prefix = form_data.pop('form_prefix')[0]
-    form_data[f'{prefix}-section'] = section
-    form = forms.CustomFieldForm(form_data, section=section, prefix=prefix)
-    update_action = None
-
-    if form.is_valid():
-        if form.cleaned_data['field_name'] or form.cleaned_data['type_agnostic_value']:
-            form.save()
-            update_action = reverse(
-                'process_existing_extras_form',
-                kwargs={'instance_id': form.instance.id},
+    with transaction.atomic():
+        try:
+            order = order_repo.set_last_edited(
+                repo.get_order_id_from_section(section_id),
+                _optional_int(request.POST.get('autosave_seq')),
             )
+        except StaleAutosave as e:
+            return _stale_autosave_response(e)
+        section = repo.get_section_or_404(section_id)
+        errors, created, delta = _save_extras_form(request.POST, section)
+        if errors:
+            return JsonResponse(errors, status=HTTPStatus.BAD_REQUEST)
+        order.apply_totals_delta({}, {section.pk: delta})
+    update_action = _extras_update_action(created) if created else None
+    return JsonResponse({'new_action': update_action, 'order': order.json()})
+
+
+def _extras_update_action(field):
+    return reverse('process_existing_extras_form', kwargs={'instance_id': field.pk})
+
+
+@async_login_required
+@async_require_http_methods(['POST'])
+async def batch_save(request, order_id):
+    '''
+    Saves changes to several forms of one order in a single transaction.
+    The JSON body has two lists, both optional, and an optional autosave_seq:
+        forms: [{form_class, instance_id, prefix (optional), version (optional), data}]
+        extras: [{instance_id or section_id, data}], where data includes form_prefix
+        autosave_seq: the client's number for this save, higher than any it sent for the order before
+    On any validation error nothing is saved, and the errors come back keyed by list and position.
+    Likewise, if any form was based on an older version of its row than the stored one,
+    nothing is saved and a 409 comes back with the current state of each such row under conflicts.
+    A save numbered at or below one already applied is dropped, and {stale: true, autosave_seq} comes back.
+    new_actions maps the form_prefix of each newly created extra field to its update URL,
+    and new_fields maps it to the field's id. versions has the new version of each saved form's row.
+    '''
+    return await database_sync_to_async(_batch_save)(request, order_id)
 
+
+def _batch_save(request, order_id):
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'__all__': ['JSONが正しくありません。']}, status=HTTPStatus.BAD_REQUEST)
+    errors = _batch_payload_errors(payload)
+    if errors:
+        return JsonResponse(errors, status=HTTPStatus.BAD_REQUEST)
+    repo = api.get_order_repository()
+    extras_repo = api.get_extras_repo()
+    conflicts = {}
+    versions = {}
+    new_actions = {}
+    new_fields = {}
+    deltas = Counter()
+    section_deltas = Counter()
+    with transaction.atomic():
+        try:
+            order = repo.set_last_edited(order_id, _optional_int(payload.get('autosave_seq')))
+        except StaleAutosave as e:
+            return _stale_autosave_response(e)
+        for i, change in enumerate(payload.get('forms', [])):
+            form, instance = _get_form_instance(order, change['form_class'], change['instance_id'])
+            prefix = change.get('prefix')
+            try:
+                form_errors, form_deltas = _save_generic_form(
+                    form, instance, _as_query_dict(change['data']),
+                    prefix=prefix, version=_optional_int(change.get('version')))
+            except VersionConflict:
+                conflicts[f'forms-{i}'] = _current_state(form, instance, prefix)
+                continue
+            if form_errors:
+                errors[f'forms-{i}'] = form_errors
+            else:
+                deltas.update(form_deltas)
+                versions[f'forms-{i}'] = instance.version
+
+        for i, change in enumerate(payload.get('extras', [])):
+            data = _as_query_dict(change['data'])
+            if change.get('instance_id'):
+                instance = extras_repo.get_field_or_404(change['instance_id'])
+                _check_owned(order, instance)
+                section_id = instance.section_id
+                form_errors, _, delta = _save_extras_form(data, instance.section, instance=instance)
+            else:
+                section = extras_repo.get_section_or_404(change['section_id'])
+                _check_owned(order, section)
+                section_id = section.pk
+                form_errors, created, delta = _save_extras_form(data, section)
+                if created:
+                    new_actions[data['form_prefix']] = _extras_update_action(created)
+                    new_fields[data['form_prefix']] = created.pk
+            if form_errors:
+                errors[f'extras-{i}'] = form_errors
+            else:
+                section_deltas[section_id] += delta
+
+        # Conflicts come first, since the client retries those by itself
+        if conflicts:
+            transaction.set_rollback(True)
+            return JsonResponse({'conflicts': conflicts}, status=HTTPStatus.CONFLICT)
+        if errors:
+            transaction.set_rollback(True)
+            return JsonResponse(errors, status=HTTPStatus.BAD_REQUEST)
+        order.apply_totals_delta(deltas, section_deltas)
+        return JsonResponse({
+            'new_actions': new_actions,
+            'new_fields': new_fields,
+            'versions': versions,
+            'order': order.json(),
+        })
+
+
+def _batch_payload_errors(payload):
+    '''Errors in the shape of a batch_save body, keyed like its validation errors'''
+    if not isinstance(payload, dict):
+        return {'__all__': ['JSONはオブジェクトでなければなりません。']}
+    errors = {}
+    for key in ['forms', 'extras']:
+        changes = payload.get(key, [])
+        if not isinstance(changes, list):
+            errors[key] = ['リストでなければなりません。']
+            continue
+        for i, change in enumerate(changes):
+            if not _is_batch_change(key, change):
+                errors[f'{key}-{i}'] = ['変更の形式が正しくありません。']
+    return errors
+
+
+def _is_batch_change(key, change):
+    if not isinstance(change, dict) or not isinstance(change.get('data'), dict):
+        return False
+    if key == 'forms':
+        return isinstance(change.get('form_class'), str) and _is_id(change.get('instance_id'))
+    return 'form_prefix' in change['data'] and (_is_id(change.get('instance_id')) or _is_id(change.get('section_id')))
+
+
+def _is_id(value):
+    # bool is an int too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _as_query_dict(data):
+    query_dict = QueryDict(mutable=True)
+    query_dict.update(data)
+    return query_dict
+
+
+@async_login_required
+@async_require_http_methods(['DELETE'])
+async def delete_extra_field(request, instance_id):
+    await database_sync_to_async(_delete_extra_field)(instance_id)
+    return JsonResponse({})
+
+
+@transaction.atomic
+def _delete_extra_field(instance_id):
+    field = api.get_extras_repo().delete_extra(instance_id)
+    if field is not None and field.order_id is not None:
+        api.get_order_repository().apply_totals_delta(
+            field.order_id, {}, {field.section_id: -field.totals_contribution})
+
+
+@login_required
+@require_http_methods(['GET'])
+def download_report(request, order_id):
+    repo = api.get_order_repository()
+    order = repo.get_full_order_or_404(order_id)
+    key = report_key(order)
+    # No Last-Modified: deleting an extra field or a new report layout changes the PDF but not last_edited,
+    # while the key changes with every one of them
+    etag = quote_etag(key)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified:
+        return not_modified
+
+    report_cache = api.get_report_cache()
+    if settings.REPORT_RENDER_ASYNC:
+        content = report_cache.get(key)
+        if content is None:
+            api.get_report_job_repository().enqueue(order.id)
+            return render(request, 'report_pending.html', {'order_id': order.id}, status=HTTPStatus.ACCEPTED)
     else:
+        _, content = report_cache.get_or_render(order, key)
+    response = FileResponse(BytesIO(content), as_attachment=False, filename=f'{order.id}-{timezone.now().date()}.pdf')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@require_http_methods(['GET'])
+def bulk_export(request):
+    form = forms.BulkExportForm(request.GET)
+    if not form.is_valid():
         return JsonResponse(form.errors, status=HTTPStatus.BAD_REQUEST)
+    repo = api.get_order_repository()
+    order_ids = repo.get_order_ids(
+        order_ids=form.cleaned_data['ids'],
+        started_from=form.cleaned_data['started_from'],
+        started_to=form.cleaned_data['started_to'],
+    )
+    if not order_ids:
+        raise Http404('注文書は存在しません。')
 
-    return JsonResponse({'new_action': update_action, 'order': order.json()})
+    today = timezone.now().date()
+    if form.cleaned_data['format'] == form.PDF:
+        # A single document can only be laid out by one ReportLab build, held in memory whole
+        if len(order_ids) > BULK_EXPORT_PDF_MAX_ORDERS:
+            return JsonResponse(
+                {'format': [f'PDF (1ファイル)は{BULK_EXPORT_PDF_MAX_ORDERS}件までです。ZIPを選んでください。']},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        orders = repo.get_full_orders(order_ids)
+        return FileResponse(OrderReport.make_combined_report(orders), as_attachment=True, filename=f'orders-{today}.pdf')
+
+    response = StreamingHttpResponse(
+        exports.stream_reports_zip(order_ids, settings.BULK_EXPORT_PROCESSES, today),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="orders-{today}.zip"'
+    return response
 
 
 @login_required
-@require_http_methods(['DELETE'])
-def delete_extra_field(request, instance_id):
-    repo = api.get_extras_repo()
-    repo.delete_extra(instance_id)
-    return JsonResponse({})
-    
+@require_http_methods(['GET'])
+def export_orders(request):
+    form = forms.OrderExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse(form.errors, status=HTTPStatus.BAD_REQUEST)
+    repo = api.get_order_repository()
+    records = repo.iter_export_records(
+        started_from=form.cleaned_data['started_from'],
+        started_to=form.cleaned_data['started_to'],
+        chunk_size=ORDER_EXPORT_CHUNK_SIZE,
+    )
+    export_format = form.cleaned_data['format']
+    stream, content_type = exports.ORDER_EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(records), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.now().date()}.{export_format}"'
+    return response
+
 
 @login_required
 @require_http_methods(['GET'])
-def download_report(request, order_id):
+def report_status(request, order_id):
     repo = api.get_order_repository()
-    order = repo.get_order_or_404(order_id)
-    report = OrderReport(order)
-    attachment = report.make_report()
-    return FileResponse(attachment, as_attachment=False, filename=f'{order.id}-{timezone.now().date()}.pdf')
+    order = repo.get_full_order_or_404(order_id)
+    key = report_key(order)
+    if api.get_report_cache().has(key):
+        return JsonResponse({'ready': True, 'failed': False})
+    job_repo = api.get_report_job_repository()
+    statuses = job_repo.statuses
+    job = order.report_jobs.order_by('-created').first()
+    if job is None or (job.status == statuses.DONE and job.report_key != key):
+        # Pruned, or rendered from the order as it was before later edits
+        job_repo.enqueue(order.id)
+        return JsonResponse({'ready': False, 'failed': False})
+    # A finished render of this very key that is not in the cache was stored where this process cannot read it,
+    # or evicted since; polling on would wait forever
+    return JsonResponse({'ready': False, 'failed': job.status in [statuses.DONE, statuses.FAILED]})
 
 
 @login_required
 @require_http_methods(['GET'])
-def get_order(request, order_id):
+def analytics(request):
+    form = forms.AnalyticsForm(request.GET)
+    ctx = {'form': form}
+    if form.is_valid():
+        ctx['group_by'] = form.cleaned_data['group_by']
+        ctx['rows'] = _get_sales_summary(form)
+    return render(request, 'analytics.html', ctx)
+
+
+@login_required
+@require_http_methods(['GET'])
+def analytics_data(request):
+    form = forms.AnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse(form.errors, status=HTTPStatus.BAD_REQUEST)
+    return JsonResponse({'rows': _get_sales_summary(form)})
+
+
+def _get_sales_summary(form):
     repo = api.get_order_repository()
-    order = repo.get_order_or_404(order_id)
-    return JsonResponse({'order': order.json()})
+    return repo.get_sales_summary(
+        form.cleaned_data['group_by'],
+        started_from=form.cleaned_data['started_from'],
+        started_to=form.cleaned_data['started_to'],
+    )
+
+
+@async_login_required
+@async_require_http_methods(['GET'])
+async def get_order(request, order_id):
+    repo = api.get_order_repository()
+    totals = await repo.aget_current_totals(order_id)
+    return JsonResponse({'order': {'id': order_id, 'itemization': totals.json()}})
 
 
 @login_required